@@ -1,13 +1,56 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify
 import requests
+import asyncio
 import json
+import math
+import operator
 import os
 from flask_cors import CORS
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ProtocolError
 import time
 import re
-from typing import Dict, List, Tuple, Optional
+import hashlib
+import heapq
+import ipaddress
+import itertools
+import socket
+import sqlite3
+import struct
+import tempfile
+import threading
+import unicodedata
+import uuid
+from collections import OrderedDict, deque
+from urllib.parse import urlparse
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Tuple, Optional, Union
 import logging
-from datetime import datetime
+from concurrent.futures import FIRST_COMPLETED, Future, InvalidStateError, ThreadPoolExecutor, as_completed, wait
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from functools import cached_property
+
+try:
+    import httpx  # Only needed for the async analyzer / ASGI serving mode
+except ImportError:
+    httpx = None
+
+try:
+    import fcntl  # Cross-process locking for the shared rate limiter (POSIX only)
+except ImportError:
+    fcntl = None
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import onnxruntime as ort  # Only needed for the local inference backend
+    from tokenizers import Tokenizer
+except ImportError:
+    ort = None
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -19,12 +62,93 @@ CORS(app)
 # Configuration class for better organization
 class Config:
     HF_API_TOKEN = os.getenv("HF_API_TOKEN")
-    HF_API_URL = "https://api-inference.huggingface.co/models/"
+    HF_API_URL = os.getenv("HF_API_URL", "https://api-inference.huggingface.co/models/")  # or a mock server
     MAX_TEXT_LENGTH = 2000
+    LONG_DOC_MAX_LENGTH = 50000    # Longer /check texts are analyzed window by window
+    LONG_DOC_WINDOW_CHARS = 1500   # Fits the models' 512-token inputs
+    LONG_DOC_MAX_WINDOWS = 32      # Windows sent to the models per document (evenly spread)
+    LONG_DOC_MAX_IN_FLIGHT = 4     # Window calls one document may have running, so it cannot fill the pool
+    LONG_DOC_DEADLINE = 60
+    PHRASE_AUTOMATON_MIN = 200     # Lexicon size from which phrase scans use the Aho-Corasick automaton
+    FEATURE_BATCH_CHUNK = 10000    # Texts per pass of the columnar batch feature extractor
+    SCORING_RULES_PATH = os.getenv("SCORING_RULES_PATH", "")   # JSON rule table; empty uses the built-in rules
+    SCORING_RULES_CHECK_INTERVAL = 5   # Seconds between checks of the rule file for changes
     REQUEST_TIMEOUT = 30
     MAX_RETRIES = 3
+    MAX_LOADING_WAIT = 60      # Cap on a model's estimated_time / Retry-After before retrying
+    MAX_WORKERS = 8            # Shared thread pool for outbound model calls
+    ANALYSIS_DEADLINE = 20     # Overall budget (seconds) for all model calls of one request
+    ASYNC_MAX_CONNECTIONS = 200    # Outbound connection cap for the async client
+    ASYNC_MAX_KEEPALIVE = 50
+    POOL_CONNECTIONS = 4       # Per-host connection pools kept by the sync client
+    POOL_MAXSIZE = int(os.getenv("POOL_MAXSIZE", "16"))   # Keep-alive connections per host
+    POOL_IDLE_TIMEOUT = 55     # Drop pooled connections idle longer than this (servers close them)
+    HTTP2_ENABLED = os.getenv("HF_HTTP2") == "1"   # Multiplex calls over HTTP/2 (needs httpx[http2])
+    RESULT_CACHE_MAX_BYTES = 32 * 1024 * 1024   # 0 disables the in-memory result cache
+    RESULT_CACHE_TTL = 3600
+    DISK_CACHE_PATH = os.getenv("DISK_CACHE_PATH", "model_cache.sqlite3")  # empty disables
+    DISK_CACHE_MAX_BYTES = 256 * 1024 * 1024
+    DISK_CACHE_TTL = 7 * 24 * 3600
+    DISK_CACHE_COMPACT_EVERY = 500   # writes between compaction passes
+    BATCH_WINDOW_MS = float(os.getenv("BATCH_WINDOW_MS", "0"))  # 0 disables micro-batching
+    BATCH_MAX_SIZE = 16
+    BREAKER_WINDOW = 60        # Seconds of call outcomes considered by each circuit breaker
+    BREAKER_MIN_CALLS = 5      # Outcomes needed in the window before the breaker can trip
+    BREAKER_ERROR_RATE = 0.5   # Failure share (errors, timeouts and slow calls) that trips it
+    BREAKER_SLOW_CALL = 10     # Seconds after which a successful call still counts as a failure
+    BREAKER_COOLDOWN = 30      # Seconds a tripped breaker stays open before probing
+    LATENCY_WINDOW = 500       # Recent successful calls kept per model for latency percentiles
+    LATENCY_MIN_SAMPLES = 20   # Samples needed before percentiles are trusted
+    ADAPTIVE_TIMEOUTS = os.getenv("HF_ADAPTIVE_TIMEOUTS", "1") == "1"   # Per-model timeouts from latency
+    TIMEOUT_PERCENTILE = 99
+    TIMEOUT_FACTOR = 3         # Attempt timeout = percentile latency x factor, doubled per retry
+    TIMEOUT_MIN = 2
+    TIMEOUT_MAX = 30           # Ceiling for models with a known latency profile
+    COLD_START_TIMEOUT = 60    # For models that are not known to be warm yet
+    ROUTING_ENABLED = os.getenv("HF_ROUTING", "1") == "1"   # Send calls for degraded models to a fallback
+    ROUTE_EWMA_ALPHA = 0.2     # Weight of the newest outcome in each model's latency/failure averages
+    ROUTE_FAILURE_RATE = 0.5   # Averaged failure rate at which a model counts as degraded
+    ROUTE_RECOVERY = 30        # Seconds for an idle model's averages to fade, so it gets traffic again
+    CASCADE_ENABLED = os.getenv("HF_CASCADE") == "1"   # Skip model calls that cannot change the verdict
+    HEDGE_ENABLED = os.getenv("HF_HEDGING") == "1"
+    HEDGE_PERCENTILE = 95      # Send a duplicate once a call is slower than this percentile
+    HEDGE_MIN_DELAY = 0.2
+    HEDGE_BUDGET_RATIO = 0.05  # At most ~5% extra calls
+    HEDGE_BUDGET_BURST = 10
+    RATE_LIMIT_PER_MINUTE = float(os.getenv("RATE_LIMIT_PER_MINUTE", "0"))  # Per model, all workers; 0 disables
+    RATE_LIMIT_BURST = 10
+    RATE_LIMIT_BULK_RESERVE = 0.5   # Share of the burst that bulk calls may not use
+    RATE_LIMIT_DIR = os.getenv("RATE_LIMIT_DIR", os.path.join(tempfile.gettempdir(), "truthlens-ratelimit"))
+    WARMUP_ENABLED = os.getenv("HF_WARMUP", "1") == "1"   # Probe every model at startup
+    WARMUP_TEXT = "Warm-up probe."
+    WARMUP_DEADLINE = 180      # Seconds startup probes keep waiting for loading models
+    KEEP_WARM_INTERVAL = int(os.getenv("KEEP_WARM_INTERVAL", "600"))  # Ping models idle this long; 0 disables
+    JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", "jobs.sqlite3")   # empty disables the /jobs API
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))   # Job threads per process
+    JOB_MAX_TEXTS = 100
+    JOB_QUEUE_MAX = 1000       # Queued jobs before new submissions are refused
+    JOB_LEASE = 300            # Seconds a worker holds a job without progress before others may take it
+    JOB_MAX_ATTEMPTS = 3       # Workers that may lose a job before it is marked failed
+    JOB_POLL_INTERVAL = 1.0
+    JOB_RETENTION = 7 * 24 * 3600   # Finished jobs are kept this long
+    JOB_CALLBACK_TIMEOUT = 10
+    JOB_CALLBACK_RETRIES = 3
+    # Hosts job callbacks may reach (comma-separated). When empty, any host that resolves only to
+    # public addresses is allowed, so callbacks can never reach loopback, private or link-local hosts.
+    JOB_CALLBACK_HOSTS = frozenset(
+        host.strip().lower() for host in os.getenv("JOB_CALLBACK_HOSTS", "").split(",") if host.strip()
+    )
+    INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "remote")   # "remote" or "local"
+    LOCAL_MODEL_DIR = os.getenv("LOCAL_MODEL_DIR", "models")
+    LOCAL_QUANTIZE = os.getenv("LOCAL_QUANTIZE") == "1"   # Dynamic int8 quantization of local models
+    LOCAL_INTRA_OP_THREADS = int(os.getenv("LOCAL_INTRA_OP_THREADS", "2"))
+    LOCAL_MAX_TOKENS = 512
 
 # Models configuration with metadata
+# An optional "revision" pins a model version; changing name or revision
+# invalidates that model's cached results. Optional "fallbacks" lists models
+# to call instead while this one is down or too slow; only fallbacks with the
+# same purpose are used, since a result is scored by its purpose.
 MODELS = {
     "primary": {
         "name": "martin-ha/toxic-comment-model",
@@ -43,6 +167,9 @@ MODELS = {
     }
 }
 
+# The models an analysis calls unless told otherwise
+ANALYSIS_MODELS = ("primary", "secondary")
+
 # Comprehensive fake news indicators
 FAKE_NEWS_PATTERNS = {
     "clickbait_phrases": [
@@ -61,6 +188,12 @@ FAKE_NEWS_PATTERNS = {
     ]
 }
 
+# The ai_processed field each model purpose feeds in calculate_credibility_score
+PURPOSE_SIGNALS = {
+    "toxicity_detection": "toxicity_score",
+    "sentiment_analysis": "sentiment_score"
+}
+
 # Sample texts for frontend
 SAMPLE_TEXTS = {
     "real": "The UAE government announced new regulations for artificial intelligence development in the country, focusing on ethical AI practices and data privacy protection. The initiative aims to position the UAE as a global leader in responsible AI innovation.",
@@ -68,6 +201,1955 @@ SAMPLE_TEXTS = {
     "unclear": "A new study suggests that people who eat chocolate daily may have better memory, though the research sample was small and the funding source was not disclosed."
 }
 
+def model_fallbacks(model_key: str) -> List[str]:
+    """The model's configured fallbacks that serve the same purpose"""
+    purpose = MODELS[model_key]["purpose"]
+    return [fallback for fallback in MODELS[model_key].get("fallbacks", []) if MODELS[fallback]["purpose"] == purpose]
+
+def served_models() -> List[str]:
+    """The models analyses can call: ANALYSIS_MODELS and the fallbacks they may be routed to"""
+    model_keys = list(ANALYSIS_MODELS)
+    for model_key in ANALYSIS_MODELS:
+        model_keys += [fallback for fallback in model_fallbacks(model_key) if fallback not in model_keys]
+    return model_keys
+
+def normalize_text(text: str) -> str:
+    """Canonical form of a text for cache keys: NFC unicode with collapsed whitespace"""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+def text_fingerprint(text: str) -> str:
+    """Stable hash of the normalized text"""
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+class PhraseMatcher:
+    """Finds every occurrence of a lexicon of categorized phrases
+
+    Built once from {category: [phrase, ...]}. Small lexicons are scanned with
+    one C-level str.find per phrase, which beats any per-character Python loop.
+    From PHRASE_AUTOMATON_MIN phrases on, an Aho-Corasick automaton finds all
+    phrases in a single pass, so the cost stops growing with the lexicon.
+    Both report the same hits.
+    """
+    
+    def __init__(self, lexicon: Dict[str, List[str]]):
+        self.categories = list(lexicon)
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]     # Pattern ids that end at each state, including via fail links
+        self._patterns = [(phrase, category) for category, phrases in lexicon.items()
+                          for phrase in phrases if phrase]   # id -> (phrase, category)
+        self.uses_automaton = len(self._patterns) >= Config.PHRASE_AUTOMATON_MIN
+        if self.uses_automaton:
+            for pattern_id, (phrase, _) in enumerate(self._patterns):
+                self._add(phrase, pattern_id)
+            self._link()
+    
+    def _add(self, phrase: str, pattern_id: int):
+        state = 0
+        for char in phrase:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+                self._goto[state][char] = next_state
+            state = next_state
+        self._output[state].append(pattern_id)
+    
+    def _link(self):
+        """Breadth-first pass setting each state's fail link to its longest proper suffix state"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self._goto[state].items():
+                queue.append(child)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+    
+    def __len__(self) -> int:
+        return len(self._patterns)
+    
+    def scan(self, text: str) -> Dict[str, Dict]:
+        """Per category: how many distinct phrases occur in text, and the (start, end) offset of every hit"""
+        if not self.uses_automaton:
+            return self._find_all(text)
+        goto, fail, output, patterns = self._goto, self._fail, self._output, self._patterns
+        hits = {category: [] for category in self.categories}
+        matched = {category: set() for category in self.categories}
+        state = 0
+        for end, char in enumerate(text, 1):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for pattern_id in output[state]:
+                phrase, category = patterns[pattern_id]
+                hits[category].append((end - len(phrase), end))
+                matched[category].add(pattern_id)
+        return {
+            category: {"count": len(matched[category]), "matches": sorted(hits[category])}
+            for category in self.categories
+        }
+    
+    def _find_all(self, text: str) -> Dict[str, Dict]:
+        """scan() for small lexicons: each phrase's occurrences, overlapping ones included, by str.find"""
+        hits = {category: [] for category in self.categories}
+        counts = dict.fromkeys(self.categories, 0)
+        find = text.find
+        for phrase, category in self._patterns:
+            start = find(phrase)
+            if start < 0:
+                continue
+            counts[category] += 1
+            size = len(phrase)
+            category_hits = hits[category]
+            while start >= 0:
+                category_hits.append((start, start + size))
+                start = find(phrase, start + 1)
+        return {
+            category: {"count": counts[category], "matches": sorted(hits[category])}
+            for category in self.categories
+        }
+
+# Compiled once; analyze_text_patterns scans lowercased text with it
+PATTERN_MATCHER = PhraseMatcher(FAKE_NEWS_PATTERNS)
+
+PUNCTUATION_RUN = re.compile(r'[.!?]+')
+REPEATED_CHAR = re.compile(r'(.)\1\1+')
+NUMBER = re.compile(r'\d+')
+URL = re.compile(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+')
+MENTION = re.compile(r'@\w+')
+
+def scan_text_features(text: str, words: Optional[List[str]] = None) -> Dict:
+    """basic_stats, punctuation_analysis, formatting_flags and content_flags for a text
+
+    Scans that can share a pass do: the [.!?] runs that give the sentence count
+    also give the excessive punctuation count, and one loop over the words gives
+    the word statistics. Everything else is a single compiled scan.
+    """
+    if words is None:
+        words = text.split()
+    sentence_runs = PUNCTUATION_RUN.findall(text)
+    excessive = 0
+    for run in sentence_runs:
+        if len(run) > 1:
+            # [!?]{2,} never spans a '.', so count the long pieces between dots
+            excessive += sum(1 for piece in run.split('.') if len(piece) > 1)
+    caps = 0
+    for word in words:
+        if len(word) > 2 and word.isupper():
+            caps += 1
+    return {
+        "basic_stats": {
+            "length": len(text),
+            "word_count": len(words),
+            "sentence_count": len(sentence_runs),
+            "avg_word_length": sum(map(len, words)) / len(words) if words else 0
+        },
+        "punctuation_analysis": {
+            "exclamation_marks": text.count('!'),
+            "question_marks": text.count('?'),
+            "ellipses": text.count('...'),
+            "quotes": text.count('"') + text.count("'")
+        },
+        "formatting_flags": {
+            "all_caps_words": caps,
+            "repeated_chars": len(REPEATED_CHAR.findall(text)),
+            "excessive_punctuation": excessive
+        },
+        "content_flags": {
+            # The URL and mention patterns start with a literal, so they skip ahead in C
+            "numbers": len(NUMBER.findall(text)),
+            "urls": len(URL.findall(text)),
+            "mentions": len(MENTION.findall(text))
+        }
+    }
+
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+')
+
+class Document:
+    """A text together with the views the analysis stages derive from it
+
+    Each view is computed the first time a stage asks for it and then kept, so
+    building one Document per request text means no view is derived twice and
+    views no stage needs are never derived.
+    """
+    
+    def __init__(self, text: str):
+        self.text = text
+    
+    @classmethod
+    def of(cls, text: Union[str, "Document"]) -> "Document":
+        return text if isinstance(text, cls) else cls(text)
+    
+    def __len__(self) -> int:
+        return len(self.text)
+    
+    @cached_property
+    def lower(self) -> str:
+        return self.text.lower()
+    
+    @cached_property
+    def words(self) -> List[str]:
+        return self.text.split()
+    
+    @cached_property
+    def sentence_spans(self) -> List[Tuple[int, int]]:
+        """(start, end) of each sentence, with the text's outer whitespace left out"""
+        start = len(self.text) - len(self.text.lstrip())
+        end = len(self.text.rstrip())
+        spans = []
+        for boundary in SENTENCE_BOUNDARY.finditer(self.text, start, max(start, end)):
+            spans.append((start, boundary.start()))
+            start = boundary.end()
+        spans.append((start, max(start, end)))
+        return spans
+    
+    @cached_property
+    def sentences(self) -> List[str]:
+        return [self.text[start:end] for start, end in self.sentence_spans]
+    
+    @cached_property
+    def normalized(self) -> str:
+        """normalize_text of the text, reusing the word split when the text is already NFC"""
+        if unicodedata.is_normalized("NFC", self.text):
+            return " ".join(self.words)
+        return normalize_text(self.text)
+    
+    @cached_property
+    def fingerprint(self) -> str:
+        """text_fingerprint of the text, used as its result cache key"""
+        return hashlib.sha256(self.normalized.encode("utf-8")).hexdigest()
+    
+    @cached_property
+    def features(self) -> Dict:
+        """scan_text_features of the text"""
+        return scan_text_features(self.text, self.words)
+
+# fake_indicators count -> the FAKE_NEWS_PATTERNS category it counts
+INDICATOR_CATEGORIES = {
+    "clickbait_count": "clickbait_phrases",
+    "sensational_words": "sensational_words",
+    "emotional_triggers": "emotional_triggers"
+}
+
+# Columns of extract_feature_matrix: the counts of analyze_text_patterns, flattened
+FEATURE_COLUMNS = (
+    "length", "word_count", "sentence_count", "avg_word_length",
+    "exclamation_marks", "question_marks", "ellipses", "quotes",
+    "all_caps_words", "repeated_chars", "excessive_punctuation",
+    "numbers", "urls", "mentions",
+    *INDICATOR_CATEGORIES
+)
+
+# Character class bits, looked up per code point by char_classes
+CHAR_SPACE, CHAR_UPPER, CHAR_UNCASED_BREAK, CHAR_DECIMAL, CHAR_WORD = 1, 2, 4, 8, 16
+_bmp_classes = None
+
+def _classify_chars(code_points) -> "np.ndarray":
+    """Class bits for each code point, from the same str predicates split(), isupper() and re use"""
+    bits = []
+    for code_point in code_points:
+        char = chr(code_point)
+        upper = char.isupper()
+        bits.append(
+            (CHAR_SPACE if char.isspace() else 0)
+            | (CHAR_UPPER if upper else 0)
+            # Lowercase or titlecase: a word containing one is not all caps
+            | (CHAR_UNCASED_BREAK if char.islower() or (char.istitle() and not upper) else 0)
+            | (CHAR_DECIMAL if char.isdecimal() else 0)
+            | (CHAR_WORD if char.isalnum() or char == "_" else 0)
+        )
+    return np.array(bits, dtype=np.uint8)
+
+def char_classes(codes: "np.ndarray") -> "np.ndarray":
+    """Class bits for an array of code points; the Basic Multilingual Plane is tabulated on first use"""
+    global _bmp_classes
+    if _bmp_classes is None:
+        _bmp_classes = _classify_chars(range(0x10000))
+    classes = _bmp_classes[np.minimum(codes, 0xFFFF)]
+    astral = codes > 0xFFFF
+    if astral.any():
+        unique, inverse = np.unique(codes[astral], return_inverse=True)
+        classes[astral] = _classify_chars(unique.tolist())[inverse]
+    return classes
+
+def _run_starts(mask: "np.ndarray") -> "np.ndarray":
+    starts = mask.copy()
+    starts[1:] &= ~mask[:-1]
+    return starts
+
+def _run_lengths(mask: "np.ndarray") -> Tuple["np.ndarray", "np.ndarray"]:
+    """Start position and length of every run of True in mask"""
+    edges = np.diff(np.concatenate(([0], mask.view(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    return starts, np.flatnonzero(edges == -1) - starts
+
+def _feature_chunk(texts: List[str]) -> Dict[str, "np.ndarray"]:
+    count = len(texts)
+    lengths = np.fromiter(map(len, texts), dtype=np.int64, count=count)
+    # "\n" between texts separates words, ends every run counted below and is in
+    # no pattern, so nothing is counted across two texts
+    joined = "\n".join(texts)
+    codes = np.frombuffer(joined.encode("utf-32-le", "surrogatepass"), dtype=np.uint32)
+    starts = np.zeros(count, dtype=np.int64)
+    np.cumsum(lengths[:-1] + 1, out=starts[1:])
+    ends = starts + lengths
+    
+    def per_text(mask):
+        """How many positions of each text are set in mask"""
+        totals = np.concatenate(([0], np.cumsum(mask, dtype=np.int64)))
+        return totals[ends] - totals[starts]
+    
+    def owners(positions):
+        return np.searchsorted(starts, positions, side="right") - 1
+    
+    def per_text_weighted(positions, weights):
+        return np.bincount(owners(positions), weights, minlength=count).astype(np.int64)
+    
+    classes = char_classes(codes)
+    in_word = (classes & CHAR_SPACE) == 0
+    word_starts = _run_starts(in_word)
+    word_count = per_text(word_starts)
+    word_chars = per_text(in_word)
+    
+    # A word is all caps with an uppercase letter, no lowercase or titlecase one and over 2 characters
+    word_ids = np.cumsum(word_starts) - 1
+    word_upper = np.bincount(word_ids[(classes & CHAR_UPPER) != 0], minlength=len(np.flatnonzero(word_starts)))
+    word_breaks = np.bincount(word_ids[(classes & CHAR_UNCASED_BREAK) != 0], minlength=len(word_upper))
+    word_lengths = np.bincount(word_ids[in_word], minlength=len(word_upper))
+    all_caps = (word_upper > 0) & (word_breaks == 0) & (word_lengths > 2)
+    
+    exclamation, question, dot = codes == 33, codes == 63, codes == 46
+    dot_starts, dot_lengths = _run_lengths(dot)
+    bang_starts, bang_lengths = _run_lengths(exclamation | question)
+    # Third character of a run of one repeated character, other than newlines
+    same = np.zeros(len(codes), dtype=bool)
+    same[1:] = codes[1:] == codes[:-1]
+    triple = np.zeros(len(codes), dtype=bool)
+    triple[2:] = same[2:] & same[1:-1]
+    decimal = (classes & CHAR_DECIMAL) != 0
+    mention = codes == 64
+    mention[:-1] &= (classes[1:] & CHAR_WORD) != 0
+    mention[-1:] = False
+    
+    features = {
+        "length": lengths,
+        "word_count": word_count,
+        "sentence_count": per_text(_run_starts(exclamation | question | dot)),
+        "avg_word_length": np.divide(word_chars, word_count, out=np.zeros(count), where=word_count > 0),
+        "exclamation_marks": per_text(exclamation),
+        "question_marks": per_text(question),
+        "ellipses": per_text_weighted(dot_starts, dot_lengths // 3),
+        "quotes": per_text((codes == 34) | (codes == 39)),
+        "all_caps_words": per_text_weighted(np.flatnonzero(word_starts), all_caps),
+        "repeated_chars": per_text(_run_starts(triple) & (codes != 10)),
+        "excessive_punctuation": per_text_weighted(bang_starts, bang_lengths > 1),
+        "numbers": per_text(_run_starts(decimal)),
+        "urls": per_text_weighted(np.array([match.start() for match in URL.finditer(joined)], dtype=np.int64), None),
+        "mentions": per_text(mention)
+    }
+    
+    # Distinct phrases present, as in analyze_text_patterns: one C-level search per phrase
+    lowered = [text.lower() for text in texts]
+    lower_joined = "\n".join(lowered)
+    lower_starts = np.zeros(count, dtype=np.int64)
+    np.cumsum(np.fromiter(map(len, lowered), dtype=np.int64, count=count)[:-1] + 1, out=lower_starts[1:])
+    for column, category in INDICATOR_CATEGORIES.items():
+        present = np.zeros(count, dtype=np.int64)
+        for phrase in FAKE_NEWS_PATTERNS[category]:
+            positions = np.array([match.start() for match in re.finditer(re.escape(phrase), lower_joined)],
+                                 dtype=np.int64)
+            hit = np.zeros(count, dtype=bool)
+            hit[np.searchsorted(lower_starts, positions, side="right") - 1] = True
+            present += hit
+        features[column] = present
+    return features
+
+def extract_feature_matrix(texts: List[str]) -> Dict[str, "np.ndarray"]:
+    """analyze_text_patterns counts for many texts at once, as one NumPy array per feature
+
+    Keys are FEATURE_COLUMNS and entry i of every array belongs to texts[i],
+    with the value analyze_text_patterns gives for that text. Texts are
+    concatenated and counted with array operations FEATURE_BATCH_CHUNK at a
+    time, which is what makes rescoring large archives affordable.
+    """
+    if np is None:
+        raise RuntimeError("Batch feature extraction needs numpy")
+    chunk = Config.FEATURE_BATCH_CHUNK
+    chunks = [_feature_chunk(texts[start:start + chunk]) for start in range(0, max(len(texts), 1), chunk)]
+    if len(chunks) == 1:
+        return chunks[0]
+    return {column: np.concatenate([features[column] for features in chunks]) for column in FEATURE_COLUMNS}
+
+# Credibility scoring as data: every rule that matches adds its delta (plus
+# delta_per_unit times the feature value) to the score and its message,
+# formatted with {value}, to the risk or positive factors. Features are the
+# FEATURE_COLUMNS counts plus the models' toxicity_score and sentiment_score.
+DEFAULT_SCORING_RULES = {
+    "base_score": 50,
+    "credible_threshold": 50,
+    "confidence": {"base": 60, "per_factor": 5, "max": 90},
+    "rules": [
+        {"feature": "clickbait_count", "op": ">", "threshold": 0, "delta_per_unit": -15, "kind": "risk",
+         "message": "Contains {value} clickbait phrases"},
+        {"feature": "sensational_words", "op": ">", "threshold": 2, "delta": -10, "kind": "risk",
+         "message": "Heavy use of sensational language"},
+        {"feature": "all_caps_words", "op": ">", "threshold": 2, "delta": -8, "kind": "risk",
+         "message": "Excessive capitalization"},
+        {"feature": "exclamation_marks", "op": ">", "threshold": 3, "delta": -5, "kind": "risk",
+         "message": "Overuse of exclamation marks"},
+        {"feature": "word_count", "op": "<", "threshold": 10, "delta": -10, "kind": "risk",
+         "message": "Too brief for credible reporting"},
+        {"feature": "word_count", "op": ">", "threshold": 100, "delta": 5, "kind": "positive",
+         "message": "Substantial content length"},
+        {"feature": "quotes", "op": ">", "threshold": 0, "delta": 8, "kind": "positive",
+         "message": "Contains quoted sources"},
+        {"feature": "toxicity_score", "op": ">", "threshold": 0.7, "delta": -20, "kind": "risk",
+         "message": "AI detected toxic/misleading patterns"},
+        {"feature": "sentiment_score", "op": ">", "threshold": 0.85, "delta": -10, "kind": "risk",
+         "message": "Extreme emotional bias"}
+    ]
+}
+
+RULE_OPERATORS = {">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le,
+                  "==": operator.eq, "!=": operator.ne}
+RULE_FEATURES = FEATURE_COLUMNS + ("toxicity_score", "sentiment_score")
+TEXT_ANALYSIS_SECTIONS = ("basic_stats", "punctuation_analysis", "formatting_flags", "content_flags", "fake_indicators")
+
+class RuleTable:
+    """A validated scoring rule table, evaluated per document or over whole feature arrays"""
+    
+    def __init__(self, table: Dict):
+        if not isinstance(table, dict) or not isinstance(table.get("rules"), list):
+            raise ValueError("A rule table needs a list of rules")
+        self.base_score = table.get("base_score", 50)
+        self.credible_threshold = table.get("credible_threshold", 50)
+        confidence = table.get("confidence", {})
+        if not isinstance(confidence, dict):
+            raise ValueError("confidence must be an object")
+        self.confidence_base = confidence.get("base", 60)
+        self.confidence_per_factor = confidence.get("per_factor", 5)
+        self.confidence_max = confidence.get("max", 90)
+        settings = (self.base_score, self.credible_threshold, self.confidence_base, self.confidence_per_factor,
+                    self.confidence_max)
+        if not all(isinstance(number, (int, float)) for number in settings):
+            raise ValueError("base_score, credible_threshold and the confidence settings must be numbers")
+        self.rules = []
+        for index, rule in enumerate(table["rules"]):
+            if not isinstance(rule, dict):
+                raise ValueError(f"Rule {index}: must be an object")
+            if rule.get("feature") not in RULE_FEATURES:
+                raise ValueError(f"Rule {index}: unknown feature {rule.get('feature')!r}")
+            if not isinstance(rule.get("op"), str) or rule["op"] not in RULE_OPERATORS:
+                raise ValueError(f"Rule {index}: unknown operator {rule.get('op')!r}")
+            if not isinstance(rule.get("kind"), str) or rule["kind"] not in ("risk", "positive"):
+                raise ValueError(f"Rule {index}: kind must be 'risk' or 'positive'")
+            numbers = (rule.get("threshold"), rule.get("delta", 0), rule.get("delta_per_unit", 0))
+            if not all(isinstance(number, (int, float)) for number in numbers):
+                raise ValueError(f"Rule {index}: threshold, delta and delta_per_unit must be numbers")
+            try:
+                # Fails now rather than mid-request on a bad placeholder (features are ints or floats)
+                rule["message"].format(value=0)
+                rule["message"].format(value=0.5)
+            except (AttributeError, KeyError, IndexError, TypeError, ValueError):
+                raise ValueError(f"Rule {index}: message must be a string with at most a {{value}} placeholder")
+            self.rules.append((rule["feature"], RULE_OPERATORS[rule["op"]], rule["threshold"],
+                               rule.get("delta", 0), rule.get("delta_per_unit", 0), rule["kind"], rule["message"]))
+        try:
+            # A table that cannot score an all-zero document would fail every request
+            self.score(dict.fromkeys(RULE_FEATURES, 0))
+        except (ArithmeticError, TypeError, ValueError) as e:
+            raise ValueError(f"Rule table cannot score a document: {e}")
+    
+    def signal_values(self, feature: str) -> Optional[List[float]]:
+        """Values in [0, 1] of a model score feature that between them reach every outcome of its rules
+
+        Rules without delta_per_unit only change what they add at their
+        thresholds, so the bounds, each threshold and the values just either
+        side of it cover every combination of them. None when a delta_per_unit
+        rule makes the score vary continuously with the feature.
+        """
+        values = {0.0, 1.0}
+        for rule_feature, _, threshold, _, delta_per_unit, _, _ in self.rules:
+            if rule_feature != feature:
+                continue
+            if delta_per_unit:
+                return None
+            values.update((threshold, math.nextafter(threshold, -math.inf), math.nextafter(threshold, math.inf)))
+        return sorted(value for value in values if 0.0 <= value <= 1.0)
+    
+    def score(self, features: Dict) -> Dict:
+        """Score, verdict, confidence and factor messages for one document's feature values"""
+        credibility_score = self.base_score
+        risk_factors = []
+        positive_factors = []
+        for feature, compare, threshold, delta, delta_per_unit, kind, message in self.rules:
+            value = features[feature]
+            if compare(value, threshold):
+                credibility_score += delta + delta_per_unit * value if delta_per_unit else delta
+                (risk_factors if kind == "risk" else positive_factors).append(message.format(value=value))
+        
+        credibility_score = max(0, min(100, credibility_score))
+        factors = len(risk_factors) + len(positive_factors)
+        return {
+            "credibility_score": credibility_score,
+            "is_credible": credibility_score >= self.credible_threshold,
+            "confidence": min(self.confidence_max, self.confidence_base + factors * self.confidence_per_factor),
+            "risk_factors": risk_factors,
+            "positive_factors": positive_factors
+        }
+    
+    def score_batch(self, features: Dict[str, "np.ndarray"]) -> Dict[str, "np.ndarray"]:
+        """score over arrays of feature values, one entry per document
+
+        Instead of messages, "fired" holds one boolean row per rule, in table
+        order, marking the documents it matched.
+        """
+        count = len(features[RULE_FEATURES[0]])
+        credibility_score = np.full(count, self.base_score)
+        factors = np.zeros(count, dtype=np.int64)
+        fired_rows = []
+        for feature, compare, threshold, delta, delta_per_unit, kind, message in self.rules:
+            value = np.asarray(features[feature])
+            fired = compare(value, threshold)
+            credibility_score = credibility_score + np.where(
+                fired, delta + delta_per_unit * value if delta_per_unit else delta, 0
+            )
+            factors += fired
+            fired_rows.append(fired)
+        
+        credibility_score = np.clip(credibility_score, 0, 100)
+        return {
+            "credibility_score": credibility_score,
+            "is_credible": credibility_score >= self.credible_threshold,
+            "confidence": np.minimum(self.confidence_max, self.confidence_base + factors * self.confidence_per_factor),
+            "fired": np.array(fired_rows, dtype=bool).reshape(len(self.rules), count)
+        }
+
+class ScoringRules:
+    """The current RuleTable, reloaded from its JSON file when the file changes
+
+    Every worker checks the file's modification time at most every
+    SCORING_RULES_CHECK_INTERVAL seconds, so an edited table takes effect
+    without a restart. A table that fails to load or validate is logged and
+    the previous one stays in use. Without a path the built-in rules apply.
+    """
+    
+    def __init__(self, path: str, check_interval: float):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._table = RuleTable(DEFAULT_SCORING_RULES)
+        self._signature = ()        # (mtime, size) of the file last read; None while it is missing
+        self._checked_at = 0.0
+        self.reloads = 0
+        self.errors = 0
+        self.last_error = None
+        self.current()
+    
+    def current(self) -> RuleTable:
+        if self.path and time.monotonic() - self._checked_at >= self.check_interval:
+            with self._lock:
+                if time.monotonic() - self._checked_at >= self.check_interval:
+                    self._checked_at = time.monotonic()
+                    self._reload_if_changed()
+        return self._table
+    
+    def _reload_if_changed(self):
+        try:
+            stat = os.stat(self.path)
+            signature = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            signature = None
+        if signature == self._signature:
+            return
+        # Remembered even if loading fails, so a broken file is reported once, not on every check
+        self._signature = signature
+        try:
+            with open(self.path, encoding="utf-8") as rules_file:
+                table = RuleTable(json.load(rules_file))
+        except (OSError, TypeError, ValueError) as e:
+            self.errors += 1
+            self.last_error = str(e)
+            logger.error(f"Could not load scoring rules from {self.path}, keeping the current ones: {e}")
+            return
+        self._table = table
+        self.reloads += 1
+        self.last_error = None
+        logger.info(f"Loaded {len(table.rules)} scoring rules from {self.path}")
+    
+    def stats(self) -> Dict:
+        return {
+            "path": self.path or None,
+            "rules": len(self._table.rules),
+            "reloads": self.reloads,
+            "errors": self.errors,
+            "last_error": self.last_error
+        }
+
+def split_windows(document: Document, window_chars: int) -> List[str]:
+    """Split a document into windows of at most window_chars, breaking between sentences
+
+    A sentence longer than a window is broken between words, or cut where it
+    has no spaces.
+    """
+    pieces = []
+    for sentence in document.sentences:
+        while len(sentence) > window_chars:
+            cut = sentence.rfind(" ", 0, window_chars + 1)
+            cut = cut if cut > 0 else window_chars
+            pieces.append(sentence[:cut])
+            sentence = sentence[cut:].lstrip()
+        if sentence:
+            pieces.append(sentence)
+    
+    windows = []
+    current = ""
+    for piece in pieces:
+        if current and len(current) + 1 + len(piece) > window_chars:
+            windows.append(current)
+            current = piece
+        else:
+            current = f"{current} {piece}" if current else piece
+    if current:
+        windows.append(current)
+    return windows
+
+def spread_sample(items: List, count: int) -> List:
+    """At most count items, evenly spaced and always including the first and last"""
+    if len(items) <= count:
+        return list(items)
+    if count == 1:
+        return items[:1]
+    return [items[round(i * (len(items) - 1) / (count - 1))] for i in range(count)]
+
+def label_scores(result) -> Dict[str, float]:
+    """Label -> score from a classification response ([[{label, score}, ...]] or [{...}])"""
+    if isinstance(result, list) and result and isinstance(result[0], list):
+        result = result[0]
+    if not isinstance(result, list):
+        return {}
+    return {item["label"]: item.get("score", 0) for item in result if isinstance(item, dict) and "label" in item}
+
+def toxicity_level(scores: Dict[str, float]) -> float:
+    """Score of the strongest label that is not a "non-toxic"-style negation"""
+    return max((score for label, score in scores.items() if not label.lower().startswith(("non", "not"))), default=0)
+
+class ModelResultCache:
+    """Thread-safe LRU cache of model results bounded by size in bytes, with a TTL"""
+    
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (result, size, expires_at)
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+    
+    def get(self, key: Tuple[str, str]) -> Optional[Dict]:
+        """Return a fresh cached result and mark it recently used"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            result, size, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.current_bytes -= size
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result
+    
+    def put(self, key: Tuple[str, str], result: Dict):
+        """Store a result, evicting least recently used entries to stay within max_bytes"""
+        size = len(json.dumps(result))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= previous[1]
+            while self._entries and self.current_bytes + size > self.max_bytes:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+            self._entries[key] = (result, size, time.monotonic() + self.ttl)
+            self.current_bytes += size
+    
+    def stats(self) -> Dict:
+        """Counters for sizing the cache"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0,
+                "evictions": self.evictions,
+                "expirations": self.expirations
+            }
+
+def model_version(model_key: str) -> str:
+    """Identity of a configured model used to key cached results"""
+    model_info = MODELS[model_key]
+    return f"{model_info['name']}@{model_info.get('revision', 'main')}"
+
+class DiskResultCache:
+    """SQLite-backed model result cache shared by every worker on the host
+
+    The database runs in WAL mode so readers in other processes never wait on
+    a writer. Rows carry the model version, so editing an entry in MODELS only
+    invalidates that model's results. Every DISK_CACHE_COMPACT_EVERY writes
+    the cache drops expired and stale rows, trims the least recently used rows
+    down to the size cap and checkpoints the WAL.
+    """
+    
+    ACCESS_UPDATE_INTERVAL = 60  # Avoid a write for every read of a hot row
+    
+    def __init__(self, path: str, max_bytes: int, ttl: float):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes_since_compaction = 0
+        # Counters are updated from many executor threads, always under _lock
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.compactions = 0
+        self.errors = 0
+        with self._connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS model_results (
+                    model_key TEXT NOT NULL,
+                    text_hash TEXT NOT NULL,
+                    model_version TEXT NOT NULL,
+                    result TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    PRIMARY KEY (model_key, text_hash)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_model_results_accessed ON model_results (accessed_at)")
+    
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread, configured for concurrent multi-process use"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+    
+    def get(self, model_key: str, text_hash: str) -> Optional[Dict]:
+        """Return a fresh result for the current version of the model"""
+        now = time.time()
+        try:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT result, created_at, accessed_at FROM model_results "
+                "WHERE model_key = ? AND text_hash = ? AND model_version = ?",
+                (model_key, text_hash, model_version(model_key))
+            ).fetchone()
+            if row is None or row[1] + self.ttl <= now:
+                with self._lock:
+                    self.misses += 1
+                return None
+            if now - row[2] > self.ACCESS_UPDATE_INTERVAL:
+                with conn:
+                    conn.execute(
+                        "UPDATE model_results SET accessed_at = ? WHERE model_key = ? AND text_hash = ?",
+                        (now, model_key, text_hash)
+                    )
+            with self._lock:
+                self.hits += 1
+            return json.loads(row[0])
+        except sqlite3.Error as e:
+            with self._lock:
+                self.errors += 1
+            logger.warning(f"Disk cache read failed: {e}")
+            return None
+    
+    def put(self, model_key: str, text_hash: str, result: Dict):
+        """Store a result, compacting the cache periodically"""
+        now = time.time()
+        encoded = json.dumps(result)
+        try:
+            with self._connection() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO model_results VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (model_key, text_hash, model_version(model_key), encoded, len(encoded), now, now)
+                )
+        except sqlite3.Error as e:
+            with self._lock:
+                self.errors += 1
+            logger.warning(f"Disk cache write failed: {e}")
+            return
+        
+        with self._lock:
+            self.writes += 1
+            self._writes_since_compaction += 1
+            due = self._writes_since_compaction >= Config.DISK_CACHE_COMPACT_EVERY
+            if due:
+                self._writes_since_compaction = 0
+        if due:
+            self.compact()
+    
+    def compact(self):
+        """Drop expired and stale-version rows, then trim to the size cap"""
+        try:
+            conn = self._connection()
+            with conn:
+                conn.execute("DELETE FROM model_results WHERE created_at <= ?", (time.time() - self.ttl,))
+                for model_key in MODELS:
+                    conn.execute(
+                        "DELETE FROM model_results WHERE model_key = ? AND model_version != ?",
+                        (model_key, model_version(model_key))
+                    )
+                conn.execute(
+                    "DELETE FROM model_results WHERE model_key NOT IN (%s)" % ",".join("?" * len(MODELS)),
+                    tuple(MODELS)
+                )
+                total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM model_results").fetchone()[0]
+                if total > self.max_bytes:
+                    # Trim to 90% of the cap so compaction does not run on every write
+                    excess = total - int(self.max_bytes * 0.9)
+                    conn.execute("""
+                        DELETE FROM model_results WHERE rowid IN (
+                            SELECT rowid FROM (
+                                SELECT rowid, size, SUM(size) OVER (ORDER BY accessed_at, rowid) AS running
+                                FROM model_results
+                            ) WHERE running - size < ?
+                        )
+                    """, (excess,))
+            conn.execute("PRAGMA incremental_vacuum")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            with self._lock:
+                self.compactions += 1
+        except sqlite3.Error as e:
+            with self._lock:
+                self.errors += 1
+            logger.warning(f"Disk cache compaction failed: {e}")
+    
+    def stats(self) -> Dict:
+        """Counters and current size of the on-disk cache"""
+        stats = {
+            "path": self.path,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "compactions": self.compactions,
+            "errors": self.errors
+        }
+        try:
+            rows, size = self._connection().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM model_results"
+            ).fetchone()
+            stats.update({"entries": rows, "bytes": size})
+        except sqlite3.Error as e:
+            logger.warning(f"Disk cache stats failed: {e}")
+        return stats
+
+class ModelUnavailable(Exception):
+    """A model call ended without a result; reason is surfaced in the response"""
+    
+    def __init__(self, model_key: str, reason: str, detail: str = ""):
+        super().__init__(f"{model_key} {reason}{': ' + detail if detail else ''}")
+        self.model_key = model_key
+        self.reason = reason
+
+def chain_future(source: Future, transform: Callable) -> Future:
+    """A future resolving to transform(result) of source, passing errors through"""
+    chained = Future()
+    chained.set_running_or_notify_cancel()
+    
+    def relay(f: Future):
+        if f.cancelled():
+            chained.set_exception(ModelUnavailable("batch", "cancelled"))
+        elif f.exception() is not None:
+            chained.set_exception(f.exception())
+        else:
+            try:
+                chained.set_result(transform(f.result()))
+            except Exception as e:
+                chained.set_exception(e)
+    
+    source.add_done_callback(relay)
+    return chained
+
+class RetryScheduler:
+    """Timer thread that re-submits parked model calls once their wait is over
+
+    Waiting for a loading model therefore holds no executor thread; the call
+    only occupies a worker again when its retry is due.
+    """
+    
+    def __init__(self, executor: ThreadPoolExecutor):
+        self.executor = executor
+        self._heap = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self.scheduled = 0
+        self._thread = threading.Thread(target=self._run, name="retry-scheduler", daemon=True)
+        self._thread.start()
+    
+    def call_later(self, delay: float, fn: Callable, *args):
+        """Run fn(*args) on the executor after delay seconds"""
+        with self._cond:
+            heapq.heappush(self._heap, (time.monotonic() + delay, next(self._counter), fn, args))
+            self.scheduled += 1
+            self._cond.notify()
+    
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._heap or self._heap[0][0] > time.monotonic():
+                    self._cond.wait(self._heap[0][0] - time.monotonic() if self._heap else None)
+                _, _, fn, args = heapq.heappop(self._heap)
+            try:
+                self.executor.submit(fn, *args)
+            except RuntimeError:
+                return  # Executor shut down with the interpreter
+    
+    def stats(self) -> Dict:
+        with self._cond:
+            return {"parked": len(self._heap), "scheduled": self.scheduled}
+
+class BatchDispatcher:
+    """Collects concurrent calls for one model into batched inference requests
+
+    The first queued text opens a window of BATCH_WINDOW_MS; everything queued
+    before it closes (or until BATCH_MAX_SIZE texts) goes out as one POST with
+    a list of inputs, and the per-input results are handed back to each caller.
+    """
+    
+    def __init__(self, model_key: str, send_batch: Callable[[List[str], Optional[float], str], Future],
+                 window: float, max_size: int):
+        self.model_key = model_key
+        self.send_batch = send_batch
+        self.window = window
+        self.max_size = max_size
+        self._pending = []  # (text, deadline, future, enqueued_at, lane)
+        self._cond = threading.Condition()
+        self.batches_sent = 0
+        self.texts_sent = 0
+        self.max_batch_size = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.size_histogram = {}
+        self._thread = threading.Thread(target=self._run, name=f"batch-{model_key}", daemon=True)
+        self._thread.start()
+    
+    def submit(self, text: str, deadline: Optional[float], lane: str = "interactive") -> Future:
+        """Queue a text for the next batch"""
+        future = Future()
+        with self._cond:
+            self._pending.append((text, deadline, future, time.monotonic(), lane))
+            self._cond.notify()
+        return future
+    
+    def _run(self):
+        """Close a batch when the window elapses or the batch is full"""
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                window_end = self._pending[0][3] + self.window
+                while len(self._pending) < self.max_size:
+                    remaining = window_end - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._pending[:self.max_size]
+                del self._pending[:self.max_size]
+            
+            # Callers that gave up while queued are dropped from the batch
+            batch = [item for item in batch if item[2].set_running_or_notify_cancel()]
+            if batch:
+                self._record(batch)
+                self._send(batch)
+    
+    def _record(self, batch: List):
+        """Update batch size and queueing delay metrics"""
+        now = time.monotonic()
+        size = len(batch)
+        with self._cond:
+            self.batches_sent += 1
+            self.texts_sent += size
+            self.max_batch_size = max(self.max_batch_size, size)
+            self.size_histogram[size] = self.size_histogram.get(size, 0) + 1
+            for _, _, _, enqueued_at, _ in batch:
+                waited = now - enqueued_at
+                self.total_wait += waited
+                self.max_wait = max(self.max_wait, waited)
+    
+    def _send(self, batch: List):
+        """Send one batched request and split the results back to the callers"""
+        texts = [item[0] for item in batch]
+        deadlines = [item[1] for item in batch]
+        # Each caller enforces its own deadline; the batch runs for the longest one
+        deadline = None if None in deadlines else max(deadlines)
+        # A batch carrying any interactive text is rate limited as interactive
+        lane = "interactive" if any(item[4] == "interactive" for item in batch) else "bulk"
+        
+        def fail(error: BaseException):
+            for _, _, future, _, _ in batch:
+                if not future.done():
+                    future.set_exception(error)
+        
+        def distribute(f: Future):
+            if f.exception() is not None:
+                fail(f.exception())
+                return
+            try:
+                results = f.result()
+                if not isinstance(results, list) or len(results) != len(batch):
+                    raise ModelUnavailable(self.model_key, "error", "batch response does not match its inputs")
+                for (_, _, future, _, _), result in zip(batch, results):
+                    future.set_result(result)
+            except Exception as e:
+                fail(e)
+        
+        try:
+            self.send_batch(texts, deadline, lane).add_done_callback(distribute)
+        except Exception as e:
+            # The dispatcher thread must survive a failed send, or every later caller would hang
+            logger.error(f"Batch for {self.model_key} could not be sent: {e}")
+            fail(e)
+    
+    def stats(self) -> Dict:
+        """Batch size and wait-time metrics for tuning the window"""
+        with self._cond:
+            return {
+                "window_ms": self.window * 1000,
+                "max_size": self.max_size,
+                "queued": len(self._pending),
+                "batches_sent": self.batches_sent,
+                "texts_sent": self.texts_sent,
+                "avg_batch_size": round(self.texts_sent / self.batches_sent, 2) if self.batches_sent else 0,
+                "max_batch_size": self.max_batch_size,
+                "batch_size_histogram": dict(sorted(self.size_histogram.items())),
+                "avg_wait_ms": round(self.total_wait / self.texts_sent * 1000, 2) if self.texts_sent else 0,
+                "max_wait_ms": round(self.max_wait * 1000, 2)
+            }
+
+class SingleFlight:
+    """Coalesces identical in-flight model calls onto one shared future
+
+    The first caller for a key starts the call; later callers for the same key
+    get their own future that mirrors the shared one, so a follower giving up
+    at its own deadline never cancels the call for everyone else.
+    """
+    
+    def __init__(self):
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.followers = 0
+    
+    def do(self, key: Tuple[str, str], start: Callable[[], Future]) -> Future:
+        """Join the in-flight call for key, or start it"""
+        with self._lock:
+            shared = self._inflight.get(key)
+            leader = shared is None
+            if leader:
+                shared = start()
+                self._inflight[key] = shared
+                self.leaders += 1
+            else:
+                self.followers += 1
+        if leader:
+            # Outside the lock: the callback runs at once if the call already finished
+            shared.add_done_callback(lambda f: self._forget(key, f))
+        return self._follow(shared)
+    
+    def _forget(self, key: Tuple[str, str], future: Future):
+        with self._lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+    
+    @staticmethod
+    def _follow(shared: Future) -> Future:
+        """A caller-owned future that receives the shared outcome, including errors"""
+        follower = Future()
+        
+        def relay(f: Future):
+            try:
+                if f.cancelled():
+                    follower.cancel()
+                elif f.exception() is not None:
+                    follower.set_exception(f.exception())
+                else:
+                    follower.set_result(f.result())
+            except InvalidStateError:
+                pass  # The caller cancelled its own future first
+        
+        shared.add_done_callback(relay)
+        return follower
+    
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "in_flight": len(self._inflight),
+                "leaders": self.leaders,
+                "coalesced": self.followers
+            }
+
+class CircuitBreaker:
+    """Per-model breaker that fails fast while a model is erroring or too slow
+
+    Closed: calls flow and outcomes are recorded over BREAKER_WINDOW seconds.
+    Open: calls are skipped for BREAKER_COOLDOWN seconds. Half-open: a single
+    probe call is let through; its success closes the breaker, its failure
+    reopens it.
+    """
+    
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+    
+    def __init__(self, model_key: str):
+        self.model_key = model_key
+        self.state = self.CLOSED
+        self._outcomes = deque()  # (timestamp, ok)
+        self._lock = threading.Lock()
+        self.opened_at = None
+        self._probe_started = None
+        self.trips = 0
+        self.rejected = 0
+        self._ewma_failure = 0.0
+        self._ewma_latency = None
+        self._ewma_updated = None
+    
+    def allow(self) -> bool:
+        """Whether a call may be made now; in half-open state only one probe is admitted"""
+        with self._lock:
+            now = time.monotonic()
+            if self.state == self.OPEN and now - self.opened_at >= Config.BREAKER_COOLDOWN:
+                self.state = self.HALF_OPEN
+                self._probe_started = None
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN:
+                # A probe that never reported back (e.g. it hit a deadline) frees the slot
+                if self._probe_started is None or now - self._probe_started > Config.REQUEST_TIMEOUT:
+                    self._probe_started = now
+                    return True
+            self.rejected += 1
+            return False
+    
+    def is_open(self) -> bool:
+        with self._lock:
+            return self.state == self.OPEN
+    
+    def record(self, ok: bool, latency: float):
+        """Record one request outcome and trip or close the breaker accordingly"""
+        ok = ok and latency <= Config.BREAKER_SLOW_CALL
+        with self._lock:
+            now = time.monotonic()
+            failure_rate, average_latency = self._decayed(now)
+            alpha = Config.ROUTE_EWMA_ALPHA
+            self._ewma_failure = alpha * (0.0 if ok else 1.0) + (1 - alpha) * failure_rate
+            self._ewma_latency = latency if average_latency is None else alpha * latency + (1 - alpha) * average_latency
+            self._ewma_updated = now
+            if self.state == self.HALF_OPEN:
+                if ok:
+                    logger.info(f"Circuit for {self.model_key} closed after successful probe")
+                    self.state = self.CLOSED
+                    self._outcomes.clear()
+                else:
+                    self._trip(now)
+                return
+            if self.state == self.OPEN:
+                return
+            
+            self._outcomes.append((now, ok))
+            while self._outcomes and self._outcomes[0][0] < now - Config.BREAKER_WINDOW:
+                self._outcomes.popleft()
+            failures = sum(1 for _, outcome_ok in self._outcomes if not outcome_ok)
+            if (len(self._outcomes) >= Config.BREAKER_MIN_CALLS
+                    and failures / len(self._outcomes) >= Config.BREAKER_ERROR_RATE):
+                self._trip(now)
+    
+    def _decayed(self, now: float) -> Tuple[float, Optional[float]]:
+        """Averages faded by the time since the last call, so a rerouted model is retried"""
+        if self._ewma_updated is None:
+            return 0.0, None
+        weight = math.exp(-(now - self._ewma_updated) / Config.ROUTE_RECOVERY)
+        return self._ewma_failure * weight, self._ewma_latency * weight
+    
+    def health(self) -> Tuple[float, Optional[float]]:
+        """Exponentially weighted failure rate and latency of recent calls (None before any call)"""
+        with self._lock:
+            return self._decayed(time.monotonic())
+    
+    def _trip(self, now: float):
+        logger.warning(f"Circuit for {self.model_key} opened for {Config.BREAKER_COOLDOWN}s")
+        self.state = self.OPEN
+        self.opened_at = now
+        self.trips += 1
+        self._outcomes.clear()
+    
+    def stats(self) -> Dict:
+        with self._lock:
+            calls = len(self._outcomes)
+            failures = sum(1 for _, ok in self._outcomes if not ok)
+            average_failure, average_latency = self._decayed(time.monotonic())
+            return {
+                "state": self.state,
+                "window_calls": calls,
+                "failure_rate": round(failures / calls, 3) if calls else 0,
+                "open_for_s": round(max(0, Config.BREAKER_COOLDOWN - (time.monotonic() - self.opened_at)), 1)
+                if self.state == self.OPEN else 0,
+                "trips": self.trips,
+                "rejected": self.rejected,
+                "ewma_failure_rate": round(average_failure, 3),
+                "ewma_latency_ms": round(average_latency * 1000, 1) if average_latency is not None else None
+            }
+
+class InferenceTransport:
+    """Outbound HTTP client for the inference host
+
+    Uses a requests.Session with an explicitly sized connection pool, or an
+    httpx client multiplexing calls over HTTP/2 when HTTP2_ENABLED. Pooled
+    connections left idle past POOL_IDLE_TIMEOUT are dropped before reuse, and
+    a request that fails on a stale keep-alive connection is retried once on a
+    fresh one. In-flight counters show whether calls are starved for connections.
+    """
+    
+    def __init__(self, session: requests.Session):
+        self.session = session
+        self.adapter = HTTPAdapter(
+            pool_connections=Config.POOL_CONNECTIONS,
+            pool_maxsize=Config.POOL_MAXSIZE,
+            max_retries=0
+        )
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
+        self.http2_client = None
+        if Config.HTTP2_ENABLED:
+            if httpx is None:
+                logger.warning("HF_HTTP2 set but httpx is not installed; using HTTP/1.1 pool")
+            else:
+                self.http2_client = httpx.Client(
+                    http2=True,
+                    headers=dict(session.headers),
+                    limits=httpx.Limits(
+                        max_connections=Config.POOL_MAXSIZE,
+                        max_keepalive_connections=Config.POOL_MAXSIZE,
+                        keepalive_expiry=Config.POOL_IDLE_TIMEOUT
+                    )
+                )
+        self.timeout_errors = (requests.exceptions.Timeout,)
+        if httpx is not None:
+            self.timeout_errors += (httpx.TimeoutException,)
+        self._lock = threading.Lock()
+        self._last_used = time.monotonic()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.requests = 0
+        self.starved = 0
+        self.stale_retries = 0
+        self.idle_resets = 0
+    
+    def post(self, url: str, payload: Dict, timeout: float):
+        """POST JSON to the inference host, returning the response object"""
+        with self._lock:
+            now = time.monotonic()
+            if self.in_flight == 0 and now - self._last_used > Config.POOL_IDLE_TIMEOUT:
+                # Idle connections have most likely been closed by the server
+                self.adapter.poolmanager.clear()
+                self.idle_resets += 1
+            self._last_used = now
+            self.requests += 1
+            if self.in_flight >= Config.POOL_MAXSIZE:
+                self.starved += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            if self.http2_client is not None:
+                return self.http2_client.post(url, json=payload, timeout=timeout)
+            started = time.monotonic()
+            try:
+                return self.session.post(url, json=payload, timeout=timeout)
+            except requests.exceptions.ConnectionError as e:
+                # Only a connection dropped mid-request (a stale keep-alive) is worth resending.
+                # Connect timeouts and refused connections would fail again, and resending
+                # with a fresh timeout would overrun the caller's deadline.
+                remaining = timeout - (time.monotonic() - started)
+                stale = (not isinstance(e, requests.exceptions.ConnectTimeout)
+                         and bool(e.args) and isinstance(e.args[0], ProtocolError))
+                if not stale or remaining <= 0:
+                    raise
+                with self._lock:
+                    self.stale_retries += 1
+                return self.session.post(url, json=payload, timeout=remaining)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+                self._last_used = time.monotonic()
+    
+    def stats(self) -> Dict:
+        """Pool utilization metrics"""
+        with self._lock:
+            return {
+                "protocol": "HTTP/2" if self.http2_client is not None else "HTTP/1.1",
+                "pool_maxsize": Config.POOL_MAXSIZE,
+                "in_flight": self.in_flight,
+                "peak_in_flight": self.peak_in_flight,
+                "utilization": round(self.in_flight / Config.POOL_MAXSIZE, 3),
+                "requests": self.requests,
+                "starved": self.starved,
+                "stale_retries": self.stale_retries,
+                "idle_resets": self.idle_resets
+            }
+
+# Upper bounds of the latency histogram buckets reported by /debug/latency
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, float("inf"))
+
+class LatencyTracker:
+    """Rolling window of recent successful call latencies for one model"""
+    
+    def __init__(self):
+        self._samples = deque(maxlen=Config.LATENCY_WINDOW)
+        self._lock = threading.Lock()
+    
+    def record(self, latency: float):
+        with self._lock:
+            self._samples.append(latency)
+    
+    def percentile(self, p: float) -> Optional[float]:
+        """Latency at percentile p, or None until enough calls have been seen"""
+        with self._lock:
+            if len(self._samples) < Config.LATENCY_MIN_SAMPLES:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+    
+    def hedge_delay(self) -> Optional[float]:
+        """How long a call may be outstanding before it is hedged"""
+        threshold = self.percentile(Config.HEDGE_PERCENTILE)
+        return None if threshold is None else max(Config.HEDGE_MIN_DELAY, threshold)
+    
+    def attempt_timeout(self, attempt: int) -> Optional[float]:
+        """Timeout for an attempt from the tail latency, or None until enough calls have been seen
+
+        Each retry doubles it, so a call that timed out because the model slowed
+        down gets more room on the next attempt.
+        """
+        threshold = self.percentile(Config.TIMEOUT_PERCENTILE)
+        if threshold is None:
+            return None
+        timeout = threshold * Config.TIMEOUT_FACTOR * 2 ** attempt
+        return min(Config.TIMEOUT_MAX, max(Config.TIMEOUT_MIN, timeout))
+    
+    def histogram(self) -> Dict[str, int]:
+        """Sample counts per latency bucket, keyed by the bucket's upper bound"""
+        with self._lock:
+            samples = list(self._samples)
+        counts = {bound: 0 for bound in LATENCY_BUCKETS_MS}
+        for latency in samples:
+            for bound in LATENCY_BUCKETS_MS:
+                if latency * 1000 <= bound:
+                    counts[bound] += 1
+                    break
+        return {f"le_{bound}ms" if bound != float("inf") else "inf": count for bound, count in counts.items()}
+    
+    def stats(self) -> Dict:
+        with self._lock:
+            samples = len(self._samples)
+        p50, p95, p99 = self.percentile(50), self.percentile(95), self.percentile(99)
+        return {
+            "samples": samples,
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "p99_ms": round(p99 * 1000, 1) if p99 is not None else None
+        }
+
+class HedgeBudget:
+    """Token bucket bounding hedged requests to a share of all calls"""
+    
+    def __init__(self):
+        self._tokens = 0.0
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.hedges = 0
+        self.hedges_won = 0
+        self.denied = 0
+    
+    def earn(self):
+        """Every call adds HEDGE_BUDGET_RATIO of a hedge to the budget"""
+        with self._lock:
+            self.calls += 1
+            self._tokens = min(Config.HEDGE_BUDGET_BURST, self._tokens + Config.HEDGE_BUDGET_RATIO)
+    
+    def spend(self) -> bool:
+        with self._lock:
+            if self._tokens < 1:
+                self.denied += 1
+                return False
+            self._tokens -= 1
+            self.hedges += 1
+            return True
+    
+    def won(self):
+        with self._lock:
+            self.hedges_won += 1
+    
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "enabled": Config.HEDGE_ENABLED,
+                "calls": self.calls,
+                "hedges": self.hedges,
+                "hedges_won": self.hedges_won,
+                "denied": self.denied,
+                "extra_call_rate": round(self.hedges / self.calls, 4) if self.calls else 0
+            }
+
+class ModelWarmth:
+    """Warm/cold state of each model, from real calls and warm-up probes
+
+    A model is "warm" after a successful call and "cold" after answering that
+    it is loading; it stays "unknown" until either happens.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = {model_key: "unknown" for model_key in MODELS}
+        self._last_success = {}
+        self._last_probe = {}
+        self.probes = 0
+        self.probe_failures = 0
+    
+    def success(self, model_key: str):
+        with self._lock:
+            self._state[model_key] = "warm"
+            self._last_success[model_key] = time.time()
+    
+    def loading(self, model_key: str):
+        with self._lock:
+            self._state[model_key] = "cold"
+    
+    def probed(self, model_key: str, ok: bool):
+        with self._lock:
+            self.probes += 1
+            self.probe_failures += 0 if ok else 1
+            self._last_probe[model_key] = time.time()
+    
+    def is_warm(self, model_key: str) -> bool:
+        with self._lock:
+            return self._state[model_key] == "warm"
+    
+    def idle_for(self, model_key: str) -> float:
+        """Seconds since the model last answered, infinite if it never has"""
+        with self._lock:
+            last = self._last_success.get(model_key)
+        return float("inf") if last is None else time.time() - last
+    
+    def stats(self) -> Dict:
+        def iso(timestamp):
+            return datetime.fromtimestamp(timestamp).isoformat() if timestamp else None
+        
+        with self._lock:
+            return {
+                model_key: {
+                    "state": state,
+                    "last_success": iso(self._last_success.get(model_key)),
+                    "last_probe": iso(self._last_probe.get(model_key))
+                }
+                for model_key, state in self._state.items()
+            }
+
+class SharedRateLimiter:
+    """Per-model token buckets shared by every worker process on the host
+
+    Each model's bucket is a small state file (tokens, last refill time) that
+    is read and updated under an exclusive flock, so gunicorn workers draw
+    from one budget. Calls come in two lanes: "interactive" may use the whole
+    bucket, while "bulk" stops once only RATE_LIMIT_BULK_RESERVE of the burst
+    is left, keeping that headroom for /check traffic.
+    """
+    
+    LANES = ("interactive", "bulk")
+    _STATE = struct.Struct("<dd")
+    
+    def __init__(self, directory: str, per_minute: float, burst: float):
+        self.directory = directory
+        self.rate = per_minute / 60
+        self.burst = burst
+        self.enabled = self.rate > 0
+        self._lock = threading.Lock()
+        self._files = {}
+        self._pid = None
+        self.granted = {lane: 0 for lane in self.LANES}
+        self.throttled = {lane: 0 for lane in self.LANES}
+        if self.enabled:
+            os.makedirs(directory, exist_ok=True)
+            if fcntl is None:
+                logger.warning("fcntl unavailable: rate limits apply per process, not across workers")
+    
+    def _file(self, model_key: str) -> int:
+        """Open state file for a model; reopened after a fork so flock excludes sibling workers"""
+        if self._pid != os.getpid():
+            self._files = {}
+            self._pid = os.getpid()
+        fd = self._files.get(model_key)
+        if fd is None:
+            fd = os.open(os.path.join(self.directory, f"{model_key}.bucket"), os.O_RDWR | os.O_CREAT, 0o600)
+            self._files[model_key] = fd
+        return fd
+    
+    def _floor(self, lane: str) -> float:
+        return self.burst * Config.RATE_LIMIT_BULK_RESERVE if lane == "bulk" else 0.0
+    
+    def _update(self, model_key: str, lane: str, take: bool) -> float:
+        """Refill the bucket and take a token if the lane allows; returns the wait for one"""
+        with self._lock:
+            fd = self._file(model_key)
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                data = os.pread(fd, self._STATE.size, 0)
+                now = time.time()
+                if len(data) == self._STATE.size:
+                    tokens, updated = self._STATE.unpack(data)
+                    tokens = min(self.burst, tokens + max(0.0, now - updated) * self.rate)
+                else:
+                    tokens = self.burst
+                needed = self._floor(lane) + 1
+                wait_time = 0.0 if tokens >= needed else (needed - tokens) / self.rate
+                if take and wait_time == 0:
+                    tokens -= 1
+                os.pwrite(fd, self._STATE.pack(tokens, now), 0)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+            if take:
+                (self.throttled if wait_time else self.granted)[lane] += 1
+            return wait_time
+    
+    def time_until_available(self, model_key: str, lane: str = "interactive") -> float:
+        """Seconds until a call in this lane could get a token, without taking one"""
+        if not self.enabled:
+            return 0.0
+        return self._update(model_key, lane, take=False)
+    
+    def try_acquire(self, model_key: str, lane: str = "interactive") -> float:
+        """Take a token for one outbound call: 0 on success, otherwise the seconds to wait"""
+        if not self.enabled:
+            return 0.0
+        return self._update(model_key, lane, take=True)
+    
+    def stats(self) -> Dict:
+        with self._lock:
+            granted, throttled = dict(self.granted), dict(self.throttled)
+        return {
+            "enabled": self.enabled,
+            "per_minute": self.rate * 60,
+            "burst": self.burst,
+            "cross_process": fcntl is not None,
+            "granted": granted,
+            "throttled": throttled,
+            "wait_seconds": {
+                model_key: round(self.time_until_available(model_key), 3) for model_key in MODELS
+            } if self.enabled else {}
+        }
+
+class LocalOnnxBackend:
+    """In-process CPU inference for text-classification models exported to ONNX
+
+    Each model lives in LOCAL_MODEL_DIR/<name with "/" replaced by "__">/ with
+    model.onnx, tokenizer.json and the Hugging Face config.json (for the
+    labels). Results use the same label/score structure as the hosted
+    inference API. Models without a local export stay on the remote API.
+    """
+    
+    def __init__(self, model_dir: str):
+        if ort is None or np is None:
+            raise RuntimeError("The local backend needs onnxruntime, tokenizers and numpy")
+        self.model_dir = model_dir
+        self._models = {}
+        self._lock = threading.Lock()
+    
+    def _path(self, model_key: str) -> str:
+        return os.path.join(self.model_dir, MODELS[model_key]["name"].replace("/", "__"))
+    
+    def supports(self, model_key: str) -> bool:
+        return os.path.exists(os.path.join(self._path(model_key), "model.onnx"))
+    
+    def _load(self, model_key: str) -> Dict:
+        """Load (and optionally quantize) a model once, on first use"""
+        with self._lock:
+            if model_key in self._models:
+                return self._models[model_key]
+            path = self._path(model_key)
+            model_file = os.path.join(path, "model.onnx")
+            if Config.LOCAL_QUANTIZE:
+                quantized = os.path.join(path, "model.int8.onnx")
+                if not os.path.exists(quantized):
+                    from onnxruntime.quantization import QuantType, quantize_dynamic
+                    logger.info(f"Quantizing {model_key} to int8")
+                    quantize_dynamic(model_file, quantized, weight_type=QuantType.QInt8)
+                model_file = quantized
+            
+            options = ort.SessionOptions()
+            options.intra_op_num_threads = Config.LOCAL_INTRA_OP_THREADS
+            options.inter_op_num_threads = 1
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            session = ort.InferenceSession(model_file, options, providers=["CPUExecutionProvider"])
+            
+            tokenizer = Tokenizer.from_file(os.path.join(path, "tokenizer.json"))
+            tokenizer.enable_truncation(max_length=Config.LOCAL_MAX_TOKENS)
+            tokenizer.enable_padding()
+            with open(os.path.join(path, "config.json")) as f:
+                model_config = json.load(f)
+            id2label = {int(index): label for index, label in model_config.get("id2label", {}).items()}
+            
+            self._models[model_key] = {
+                "session": session,
+                "tokenizer": tokenizer,
+                "labels": [id2label.get(i, f"LABEL_{i}") for i in range(len(id2label))],
+                "multi_label": model_config.get("problem_type") == "multi_label_classification",
+                "input_names": {node.name for node in session.get_inputs()}
+            }
+            logger.info(f"Loaded local model for {model_key} from {model_file}")
+            return self._models[model_key]
+    
+    def infer(self, model_key: str, inputs: Union[str, List[str]]) -> List:
+        """Classify one text or a list of texts, in the hosted API's response shape"""
+        model = self._load(model_key)
+        texts = [inputs] if isinstance(inputs, str) else inputs
+        encodings = model["tokenizer"].encode_batch(texts)
+        feed = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        }
+        if "token_type_ids" in model["input_names"]:
+            feed["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+        logits = model["session"].run(None, feed)[0]
+        
+        if model["multi_label"]:
+            scores = 1 / (1 + np.exp(-logits))
+        else:
+            shifted = np.exp(logits - logits.max(axis=1, keepdims=True))
+            scores = shifted / shifted.sum(axis=1, keepdims=True)
+        
+        results = []
+        for row in scores:
+            ranked = sorted(zip(model["labels"], row.tolist()), key=lambda item: item[1], reverse=True)
+            results.append([{"label": label, "score": score} for label, score in ranked])
+        return results
+
+class JobStore:
+    """SQLite-backed queue of analysis jobs, shared by every worker on the host
+
+    A worker claims a job by taking a lease on it and renews the lease each
+    time it saves a finished text. If the worker dies, the lease runs out and
+    another worker resumes the job after the last saved text.
+    """
+    
+    # SET clause queueing the callback of a job as it finishes, done or failed (binds callback_next_at)
+    QUEUE_CALLBACK = ("callback_status = CASE WHEN callback_url IS NULL THEN NULL ELSE 'pending' END, "
+                      "callback_next_at = ?")
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    texts TEXT NOT NULL,
+                    results TEXT NOT NULL,
+                    callback_url TEXT,
+                    callback_status TEXT,
+                    error TEXT,
+                    attempts INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    lease_until REAL,
+                    callback_attempts INTEGER NOT NULL DEFAULT 0,
+                    callback_next_at REAL
+                )
+            """)
+            # Queues created before callbacks were delivered from the table lack these columns
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for column, definition in (("callback_attempts", "INTEGER NOT NULL DEFAULT 0"),
+                                       ("callback_next_at", "REAL")):
+                if column not in columns:
+                    try:
+                        conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {definition}")
+                    except sqlite3.OperationalError:
+                        pass   # Another worker added it first
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_callback ON jobs (callback_status, callback_next_at)")
+    
+    def _connection(self) -> sqlite3.Connection:
+        """One autocommit connection per thread; claims run in explicit transactions"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+    
+    def create(self, texts: List[str], callback_url: Optional[str]) -> Optional[str]:
+        """Queue a job and return its id, or None when the queue is full"""
+        job_id = uuid.uuid4().hex
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            queued = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+            if queued >= Config.JOB_QUEUE_MAX:
+                job_id = None
+            else:
+                conn.execute(
+                    "INSERT INTO jobs (id, status, texts, results, callback_url, attempts, created_at) "
+                    "VALUES (?, 'queued', ?, '[]', ?, 0, ?)",
+                    (job_id, json.dumps(texts), callback_url, time.time())
+                )
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return job_id
+    
+    def claim(self) -> Optional[Dict]:
+        """Lease the oldest queued job, or one whose worker stopped renewing its lease"""
+        now = time.time()
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', error = 'Job was abandoned by too many workers', "
+                "finished_at = ?, lease_until = NULL, " + self.QUEUE_CALLBACK +
+                " WHERE status = 'running' AND lease_until < ? AND attempts >= ?",
+                (now, now, now, Config.JOB_MAX_ATTEMPTS)
+            )
+            row = conn.execute(
+                "SELECT id, texts, results, callback_url FROM jobs "
+                "WHERE status = 'queued' OR (status = 'running' AND lease_until < ?) "
+                "ORDER BY created_at LIMIT 1",
+                (now,)
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', attempts = attempts + 1, lease_until = ?, "
+                    "started_at = COALESCE(started_at, ?) WHERE id = ?",
+                    (now + Config.JOB_LEASE, now, row[0])
+                )
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        if row is None:
+            return None
+        return {"id": row[0], "texts": json.loads(row[1]), "results": json.loads(row[2]), "callback_url": row[3]}
+    
+    def save_progress(self, job_id: str, results: List[Dict]):
+        """Store the results so far and renew the lease"""
+        self._connection().execute(
+            "UPDATE jobs SET results = ?, lease_until = ? WHERE id = ?",
+            (json.dumps(results), time.time() + Config.JOB_LEASE, job_id)
+        )
+    
+    def finish(self, job_id: str, status: str, error: Optional[str] = None):
+        """Mark a job finished; a job with a callback URL gets its delivery queued in the same update"""
+        now = time.time()
+        self._connection().execute(
+            "UPDATE jobs SET status = ?, error = ?, finished_at = ?, lease_until = NULL, " + self.QUEUE_CALLBACK +
+            " WHERE id = ?",
+            (status, error, now, now, job_id)
+        )
+    
+    def claim_callback(self) -> Optional[Dict]:
+        """Lease the next due callback delivery, counting it as an attempt
+
+        If the worker dies while delivering, the lease runs out and another
+        worker makes the next attempt.
+        """
+        now = time.time()
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT id, callback_url, callback_attempts FROM jobs "
+                "WHERE callback_status = 'pending' AND callback_next_at <= ? ORDER BY callback_next_at LIMIT 1",
+                (now,)
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE jobs SET callback_attempts = callback_attempts + 1, callback_next_at = ? WHERE id = ?",
+                    (now + 3 * Config.JOB_CALLBACK_TIMEOUT, row[0])
+                )
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        if row is None:
+            return None
+        return {"id": row[0], "callback_url": row[1], "attempt": row[2] + 1}
+    
+    def set_callback_status(self, job_id: str, callback_status: str, next_at: Optional[float] = None):
+        """Record a delivery outcome; a "pending" callback is attempted again from next_at"""
+        self._connection().execute(
+            "UPDATE jobs SET callback_status = ?, callback_next_at = ? WHERE id = ?",
+            (callback_status, next_at, job_id)
+        )
+    
+    def get(self, job_id: str) -> Optional[Dict]:
+        row = self._connection().execute(
+            "SELECT id, status, texts, results, callback_url, callback_status, error, attempts, "
+            "created_at, started_at, finished_at FROM jobs WHERE id = ?",
+            (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        keys = ("id", "status", "texts", "results", "callback_url", "callback_status", "error", "attempts",
+                "created_at", "started_at", "finished_at")
+        job = dict(zip(keys, row))
+        job["texts"] = json.loads(job["texts"])
+        job["results"] = json.loads(job["results"])
+        return job
+    
+    def purge(self):
+        """Forget finished jobs older than JOB_RETENTION"""
+        self._connection().execute(
+            "DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?",
+            (time.time() - Config.JOB_RETENTION,)
+        )
+    
+    def stats(self) -> Dict:
+        rows = self._connection().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+class JobRunner:
+    """Bounded pool of threads that works through the job queue
+
+    analyze(text) returns the /check response for one text. Threads poll the
+    store, so jobs submitted to any worker process are picked up; submissions
+    to this process wake the threads at once.
+    """
+    
+    def __init__(self, store: JobStore, analyze: Callable[[str], Dict], workers: int):
+        self.store = store
+        self.analyze = analyze
+        self.workers = workers
+        self._wakeup = threading.Event()
+        self._last_purge = 0.0
+        self._threads = []
+    
+    def start(self):
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"job-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+    
+    def submit(self, texts: List[str], callback_url: Optional[str] = None) -> Optional[str]:
+        """Queue a job; returns its id, or None when the queue is full"""
+        job_id = self.store.create(texts, callback_url)
+        if job_id is not None:
+            self._wakeup.set()
+        return job_id
+    
+    def _run(self):
+        while True:
+            try:
+                # Callbacks are quick and already overdue, so they go before new jobs
+                callback = self.store.claim_callback()
+                job = None if callback is not None else self.store.claim()
+            except sqlite3.Error as e:
+                logger.warning(f"Job queue unavailable: {e}")
+                callback = job = None
+            if callback is not None:
+                try:
+                    self._notify(callback)
+                except Exception as e:
+                    logger.error(f"Callback for job {callback['id']} interrupted: {e}")
+                continue
+            if job is None:
+                self._purge_if_due()
+                self._wakeup.wait(Config.JOB_POLL_INTERVAL)
+                self._wakeup.clear()
+                continue
+            try:
+                self._process(job)
+            except Exception as e:
+                # The lease runs out and the job is retried, up to JOB_MAX_ATTEMPTS
+                logger.error(f"Job {job['id']} interrupted: {e}")
+    
+    def _process(self, job: Dict):
+        """Analyze the texts not yet done, saving after each one"""
+        results = job["results"]
+        if results:
+            logger.info(f"Resuming job {job['id']} at text {len(results) + 1} of {len(job['texts'])}")
+        for text in job["texts"][len(results):]:
+            try:
+                results.append(self.analyze(text))
+            except Exception as e:
+                logger.error(f"Job {job['id']} text {len(results) + 1} failed: {e}")
+                results.append({'error': 'Analysis failed'})
+            self.store.save_progress(job["id"], results)
+        self.store.finish(job["id"], "done")
+    
+    def _notify(self, callback: Dict):
+        """Make one delivery attempt of a finished job to its callback URL
+
+        A failed attempt is queued again with exponential backoff rather than
+        retried here, so a worker thread never sleeps on a slow receiver.
+        """
+        job_id = callback["id"]
+        # Checked again at delivery: the host's DNS may have changed since the job was accepted
+        error = callback_url_error(callback["callback_url"])
+        if error:
+            logger.warning(f"Callback for job {job_id} not sent: {error}")
+            self.store.set_callback_status(job_id, "failed")
+            return
+        try:
+            response = requests.post(callback["callback_url"], json=build_job_response(self.store.get(job_id)),
+                                     timeout=Config.JOB_CALLBACK_TIMEOUT, allow_redirects=False)
+            if response.status_code < 300:
+                self.store.set_callback_status(job_id, "delivered")
+                return
+            logger.warning(f"Callback for job {job_id} answered HTTP {response.status_code}")
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"Callback for job {job_id} failed: {e}")
+        if callback["attempt"] >= Config.JOB_CALLBACK_RETRIES:
+            self.store.set_callback_status(job_id, "failed")
+        else:
+            self.store.set_callback_status(job_id, "pending", time.time() + 2 ** callback["attempt"])
+    
+    def _purge_if_due(self):
+        if time.monotonic() - self._last_purge > 3600:
+            self._last_purge = time.monotonic()
+            try:
+                self.store.purge()
+            except sqlite3.Error as e:
+                logger.warning(f"Job purge failed: {e}")
+    
+    def stats(self) -> Dict:
+        return {"workers": self.workers, "jobs": self.store.stats()}
+
 class NewsAnalyzer:
     """Centralized news analysis logic"""
     
@@ -80,80 +2162,683 @@ class NewsAnalyzer:
             self.session.headers.update({
                 "Authorization": f"Bearer {Config.HF_API_TOKEN}"
             })
+        self.transport = InferenceTransport(self.session)
+        self.executor = ThreadPoolExecutor(
+            max_workers=Config.MAX_WORKERS,
+            thread_name_prefix="hf-call"
+        )
+        self.result_cache = ModelResultCache(Config.RESULT_CACHE_MAX_BYTES, Config.RESULT_CACHE_TTL)
+        self.disk_cache = None
+        if Config.DISK_CACHE_PATH:
+            self.disk_cache = DiskResultCache(
+                Config.DISK_CACHE_PATH, Config.DISK_CACHE_MAX_BYTES, Config.DISK_CACHE_TTL
+            )
+        self.single_flight = SingleFlight()
+        self.retry_scheduler = RetryScheduler(self.executor)
+        self.breakers = {model_key: CircuitBreaker(model_key) for model_key in MODELS}
+        self.latency = {model_key: LatencyTracker() for model_key in MODELS}
+        self.hedge_budget = HedgeBudget()
+        self.warmth = ModelWarmth()
+        self.cascade_stats = {"analyses": 0, "calls_skipped": 0, "latency_saved_s": 0.0}
+        self.route_counts = {}
+        self._stats_lock = threading.Lock()
+        self.warmed_up = threading.Event()
+        self.scoring_rules = ScoringRules(Config.SCORING_RULES_PATH, Config.SCORING_RULES_CHECK_INTERVAL)
+        self.rate_limiter = SharedRateLimiter(
+            Config.RATE_LIMIT_DIR, Config.RATE_LIMIT_PER_MINUTE, Config.RATE_LIMIT_BURST
+        )
+        self.local_backend = None
+        if Config.INFERENCE_BACKEND == "local":
+            self.local_backend = LocalOnnxBackend(Config.LOCAL_MODEL_DIR)
+        self.batchers = {}
+        if Config.BATCH_WINDOW_MS > 0:
+            for model_key in MODELS:
+                self.batchers[model_key] = BatchDispatcher(
+                    model_key,
+                    lambda texts, deadline, lane, model_key=model_key:
+                        self._start_batch_request(model_key, texts, deadline, lane),
+                    Config.BATCH_WINDOW_MS / 1000,
+                    Config.BATCH_MAX_SIZE
+                )
+    
+    @staticmethod
+    def _remaining(deadline: Optional[float], cap: float) -> float:
+        """Seconds left before the deadline, capped at the given value"""
+        if deadline is None:
+            return cap
+        return min(cap, deadline - time.monotonic())
+    
+    @staticmethod
+    def _cache_key(model_key: str, text_hash: str) -> Tuple[str, str]:
+        """Results are cached per model version and normalized text"""
+        return model_version(model_key), text_hash
+    
+    def _cached_result(self, model_key: str, text_hash: str) -> Optional[Dict]:
+        """Look in memory first, then on disk, promoting disk hits into memory"""
+        cached = self.result_cache.get(self._cache_key(model_key, text_hash))
+        if cached is None and self.disk_cache is not None:
+            cached = self.disk_cache.get(model_key, text_hash)
+            if cached is not None:
+                self.result_cache.put(self._cache_key(model_key, text_hash), cached)
+        return cached
+    
+    def _store_result(self, model_key: str, text_hash: str, result: Dict):
+        """Write a fresh result through both cache tiers"""
+        self.result_cache.put(self._cache_key(model_key, text_hash), result)
+        if self.disk_cache is not None:
+            self.disk_cache.put(model_key, text_hash, result)
+    
+    def call_huggingface_api(self, model_key: str, text: str, deadline: Optional[float] = None,
+                             lane: str = "interactive") -> Optional[Dict]:
+        """Model result for a text, served from the result caches when possible
+
+        Blocks until the result arrives or the deadline passes, so it must not be
+        called from the analyzer's own executor threads.
+        """
+        text_hash = text_fingerprint(text)
+        cached = self._cached_result(model_key, text_hash)
+        if cached is not None:
+            return cached
+        future = self._start_model_call(model_key, text, text_hash, deadline, lane)
+        try:
+            return future.result(timeout=self._remaining(deadline, Config.ANALYSIS_DEADLINE))
+        except ModelUnavailable:
+            return None
+        except Exception as e:
+            logger.warning(f"Call to {model_key} failed: {e}")
+            future.cancel()
+            return None
+    
+    def _start_model_call(self, model_key: str, text: str, text_hash: str,
+                          deadline: Optional[float], lane: str = "interactive") -> Future:
+        """Begin an uncached model call, or join an identical one already in flight"""
+        return self.single_flight.do(
+            self._cache_key(model_key, text_hash),
+            lambda: self._launch_model_call(model_key, text, text_hash, deadline, lane)
+        )
+    
+    def _launch_model_call(self, model_key: str, text: str, text_hash: str,
+                           deadline: Optional[float], lane: str = "interactive") -> Future:
+        """Start a model call, batched with concurrent callers when enabled"""
+        if not self.breakers[model_key].allow():
+            future = Future()
+            future.set_running_or_notify_cancel()
+            future.set_exception(ModelUnavailable(model_key, "circuit_open"))
+            return future
+        if model_key in self.batchers:
+            future = self.batchers[model_key].submit(text, deadline, lane)
+        else:
+            future = self._start_request(model_key, text, deadline, lane)
+        future.add_done_callback(lambda f: self._store_future_result(model_key, text_hash, f))
+        return future
+    
+    def _store_future_result(self, model_key: str, text_hash: str, future: Future):
+        """Cache the outcome of a completed call"""
+        if not future.cancelled() and future.exception() is None and future.result() is not None:
+            self._store_result(model_key, text_hash, future.result())
+    
+    def _start_batch_request(self, model_key: str, texts: List[str], deadline: Optional[float],
+                             lane: str = "interactive") -> Future:
+        """One inference request for several texts, resolving to per-text results"""
+        if len(texts) == 1:
+            return chain_future(self._start_request(model_key, texts[0], deadline, lane), lambda result: [result])
+        
+        def split(results):
+            if not isinstance(results, list) or len(results) != len(texts):
+                raise ModelUnavailable(model_key, "error", "Unexpected batch response shape")
+            # Wrap each entry so it matches the shape of a single-input response
+            return [[result] for result in results]
+        
+        return chain_future(self._start_request(model_key, texts, deadline, lane), split)
+    
+    def _start_request(self, model_key: str, inputs: Union[str, List[str]],
+                       deadline: Optional[float], lane: str = "interactive") -> Future:
+        """Start an inference request; the future resolves to the decoded response
+
+        With hedging enabled, a duplicate attempt is scheduled for when the call
+        has been outstanding longer than the model's usual tail latency.
+        """
+        future = Future()
+        future.set_running_or_notify_cancel()
+        if self.local_backend is not None and self.local_backend.supports(model_key):
+            self.executor.submit(self._local_attempt, model_key, inputs, future)
+            return future
+        self.executor.submit(self._attempt, model_key, inputs, deadline, 0, future, False, lane)
+        if Config.HEDGE_ENABLED:
+            self.hedge_budget.earn()
+            delay = self.latency[model_key].hedge_delay()
+            if delay is not None and self._remaining(deadline, delay) >= delay:
+                self.retry_scheduler.call_later(delay, self._hedge, model_key, inputs, deadline, future, lane)
+        return future
     
-    def call_huggingface_api(self, model_key: str, text: str) -> Optional[Dict]:
-        """Enhanced API call with better error handling"""
+    def _local_attempt(self, model_key: str, inputs: Union[str, List[str]], future: Future):
+        """Run the model in-process on the CPU backend"""
+        started = time.monotonic()
+        try:
+            results = self.local_backend.infer(model_key, inputs)
+        except Exception as e:
+            logger.error(f"Local inference error for {model_key}: {e}")
+            self.breakers[model_key].record(False, time.monotonic() - started)
+            self._settle(future, error=ModelUnavailable(model_key, "error", str(e)))
+            return
+        latency = time.monotonic() - started
+        self.breakers[model_key].record(True, latency)
+        self.latency[model_key].record(latency)
+        self.warmth.success(model_key)
+        # A single input gets the same [[...]] shape as the hosted API returns
+        self._settle(future, results if isinstance(inputs, list) else results[:1])
+    
+    def _hedge(self, model_key: str, inputs: Union[str, List[str]], deadline: Optional[float],
+               future: Future, lane: str = "interactive"):
+        """Send a duplicate of a slow call if it is still unanswered and the budget allows"""
+        if future.done() or not self.hedge_budget.spend():
+            return
+        logger.info(f"Hedging slow call to {model_key}")
+        self._attempt(model_key, inputs, deadline, 0, future, hedge=True, lane=lane)
+    
+    def _attempt_timeout(self, model_key: str, attempt: int) -> float:
+        """Per-attempt timeout: adaptive for warm models with a latency profile, generous otherwise"""
+        if not Config.ADAPTIVE_TIMEOUTS:
+            return Config.REQUEST_TIMEOUT
+        if not self.warmth.is_warm(model_key):
+            return Config.COLD_START_TIMEOUT
+        timeout = self.latency[model_key].attempt_timeout(attempt)
+        return Config.REQUEST_TIMEOUT if timeout is None else timeout
+    
+    @staticmethod
+    def _settle(future: Future, result=None, error: Optional[Exception] = None) -> bool:
+        """Resolve a call unless another attempt already did; returns whether this one won"""
+        try:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+            return True
+        except InvalidStateError:
+            return False
+    
+    def _attempt(self, model_key: str, inputs: Union[str, List[str]], deadline: Optional[float],
+                 attempt: int, future: Future, hedge: bool = False, lane: str = "interactive"):
+        """Make one request attempt; retries are parked on the scheduler instead of sleeping
+
+        A hedge attempt only ever supplies a result: its failures and retries are
+        left to the original attempt. Every attempt, hedges included, needs a
+        rate limiter token; a call that has to wait for one is parked as well.
+        """
+        if future.done():
+            return  # Answered by the other attempt while this one was queued
         model_info = MODELS[model_key]
         url = f"{Config.HF_API_URL}{model_info['name']}"
-        payload = {"inputs": text}
+        payload = {"inputs": inputs}
         
-        for attempt in range(Config.MAX_RETRIES):
-            try:
-                response = self.session.post(
-                    url, 
-                    json=payload, 
-                    timeout=Config.REQUEST_TIMEOUT
-                )
+        timeout = self._remaining(deadline, self._attempt_timeout(model_key, attempt))
+        if timeout <= 0:
+            logger.warning(f"Deadline reached before calling {model_key}")
+            if not hedge:
+                self._settle(future, error=ModelUnavailable(model_key, "deadline"))
+            return
+        token_wait = self.rate_limiter.try_acquire(model_key, lane)
+        if token_wait > 0:
+            if not hedge:
+                self._wait_for_token(model_key, inputs, deadline, attempt, future, token_wait, lane)
+            return
+        breaker = self.breakers[model_key]
+        started = time.monotonic()
+        try:
+            response = self.transport.post(url, payload, timeout)
+            
+            if response.status_code == 200:
+                logger.info(f"Successful API call to {model_key}")
+                latency = time.monotonic() - started
+                breaker.record(True, latency)
+                self.latency[model_key].record(latency)
+                self.warmth.success(model_key)
+                if self._settle(future, response.json()) and hedge:
+                    self.hedge_budget.won()
+            elif hedge:
+                return
+            elif response.status_code in (429, 503):
+                # Loading or throttled is not an outage, so it does not count against the breaker
+                if response.status_code == 503:
+                    self.warmth.loading(model_key)
+                self._retry_later(model_key, inputs, deadline, attempt, future,
+                                  self._loading_wait(response, attempt),
+                                  "loading" if response.status_code == 503 else "rate_limited", lane)
+            else:
+                logger.error(f"API Error {response.status_code}: {response.text}")
+                breaker.record(False, time.monotonic() - started)
+                self._settle(future, error=ModelUnavailable(model_key, "error", f"HTTP {response.status_code}"))
                 
-                if response.status_code == 200:
-                    logger.info(f"Successful API call to {model_key}")
-                    return response.json()
-                elif response.status_code == 503:
-                    wait_time = 2 ** attempt
-                    logger.warning(f"Model loading, waiting {wait_time}s")
-                    time.sleep(wait_time)
-                    continue
-                else:
-                    logger.error(f"API Error {response.status_code}: {response.text}")
-                    return None
-                    
-            except requests.exceptions.Timeout:
-                logger.warning(f"Request timeout on attempt {attempt + 1}")
-                if attempt < Config.MAX_RETRIES - 1:
-                    time.sleep(1)
-                    continue
+        except self.transport.timeout_errors:
+            logger.warning(f"Request timeout on attempt {attempt + 1}")
+            breaker.record(False, time.monotonic() - started)
+            if not hedge:
+                self._retry_later(model_key, inputs, deadline, attempt, future, 1, "timeout", lane)
+        except Exception as e:
+            logger.error(f"Request error: {str(e)}")
+            breaker.record(False, time.monotonic() - started)
+            if not hedge:
+                self._settle(future, error=ModelUnavailable(model_key, "error", str(e)))
+    
+    def _retry_later(self, model_key: str, inputs: Union[str, List[str]], deadline: Optional[float],
+                     attempt: int, future: Future, wait_time: float, reason: str, lane: str = "interactive"):
+        """Park the call until wait_time has passed, or give up now if the deadline cannot allow it"""
+        if future.done():
+            return
+        if self.breakers[model_key].is_open():
+            self._settle(future, error=ModelUnavailable(model_key, "circuit_open"))
+            return
+        if attempt + 1 >= Config.MAX_RETRIES or self._remaining(deadline, wait_time) < wait_time:
+            logger.warning(f"Model {model_key} {reason}, no time left to wait {wait_time:.1f}s")
+            self._settle(future, error=ModelUnavailable(model_key, reason))
+            return
+        logger.warning(f"Model {model_key} {reason}, retrying in {wait_time:.1f}s")
+        self.retry_scheduler.call_later(
+            wait_time, self._attempt, model_key, inputs, deadline, attempt + 1, future, False, lane
+        )
+    
+    def _wait_for_token(self, model_key: str, inputs: Union[str, List[str]], deadline: Optional[float],
+                        attempt: int, future: Future, wait_time: float, lane: str):
+        """Park an attempt until the rate limiter can grant it, unless that would overrun the deadline"""
+        if self._remaining(deadline, wait_time) < wait_time:
+            logger.warning(f"Model {model_key} rate limited, no time left to wait {wait_time:.1f}s")
+            self._settle(future, error=ModelUnavailable(model_key, "rate_limited"))
+            return
+        self.retry_scheduler.call_later(
+            wait_time, self._attempt, model_key, inputs, deadline, attempt, future, False, lane
+        )
+    
+    @staticmethod
+    def _loading_wait(response, attempt: int) -> float:
+        """Wait before retrying a loading model: estimated_time, then Retry-After, then backoff"""
+        try:
+            estimated_time = response.json().get("estimated_time")
+            if estimated_time is not None:
+                return min(float(estimated_time), Config.MAX_LOADING_WAIT)
+        except (ValueError, AttributeError, TypeError):
+            pass
+        retry_after = response.headers.get("Retry-After")
+        if retry_after:
+            try:
+                return min(float(retry_after), Config.MAX_LOADING_WAIT)
+            except ValueError:
+                try:
+                    delay = (parsedate_to_datetime(retry_after) - datetime.now(timezone.utc)).total_seconds()
+                    return min(max(delay, 0), Config.MAX_LOADING_WAIT)
+                except (TypeError, ValueError):
+                    pass
+        return 2 ** attempt
+    
+    def start_warmup(self):
+        """Probe the served models in the background, then keep idle ones from unloading
+
+        warmed_up is set once the startup probes have finished, whether or not
+        every model answered; per-model state is in warmth.
+        """
+        if not Config.WARMUP_ENABLED:
+            self.warmed_up.set()
+            return
+        threading.Thread(target=self._keep_warm, name="model-warmup", daemon=True).start()
+    
+    def _keep_warm(self):
+        # Models no analysis can reach (e.g. backup) would only burn quota and rate limit tokens
+        model_keys = served_models()
+        self._probe_models(model_keys, Config.WARMUP_DEADLINE)
+        self.warmed_up.set()
+        logger.info(f"Model warm-up finished: {self.warmth.stats()}")
+        if Config.KEEP_WARM_INTERVAL <= 0:
+            return
+        while True:
+            time.sleep(Config.KEEP_WARM_INTERVAL / 4)
+            # Traffic keeps a model warm by itself, so only idle models are pinged
+            idle = [model_key for model_key in model_keys
+                    if self.warmth.idle_for(model_key) >= Config.KEEP_WARM_INTERVAL]
+            if idle:
+                self._probe_models(idle, Config.REQUEST_TIMEOUT)
+    
+    def _probe_models(self, model_keys: List[str], budget: float):
+        """Probe models in parallel, waiting through loading responses until the budget runs out"""
+        deadline = time.monotonic() + budget
+        threads = [threading.Thread(target=self._probe, args=(model_key, deadline), name=f"probe-{model_key}")
+                   for model_key in model_keys]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    
+    def _probe(self, model_key: str, deadline: float):
+        """Send the probe text straight to the model, bypassing the result caches"""
+        ok = False
+        while not ok and not self.breakers[model_key].is_open():
+            future = self._start_request(model_key, Config.WARMUP_TEXT, deadline, "bulk")
+            try:
+                future.result(timeout=self._remaining(deadline, Config.WARMUP_DEADLINE))
+                ok = True
+            except ModelUnavailable as e:
+                # A model that is still loading gets another probe while the budget lasts
+                if e.reason != "loading" or self._remaining(deadline, 1) < 1:
+                    break
             except Exception as e:
-                logger.error(f"Request error: {str(e)}")
-                return None
+                logger.warning(f"Warm-up probe for {model_key} failed: {e}")
+                future.cancel()
+                break
+        self.warmth.probed(model_key, ok)
+    
+    def run_analysis(self, text: Union[str, Document], model_keys: Tuple[str, ...] = ANALYSIS_MODELS,
+                     deadline: Optional[float] = None, lane: str = "interactive") -> Tuple[Dict, Dict, Dict]:
+        """Fan out all model calls at once and run pattern analysis while they are in flight
+
+        Returns the AI results by purpose, the text analysis and the status of
+        each model call ("ok", "cached", or why the model was left out). The
+        lane sets the call's rate limit priority ("interactive" or "bulk").
+        """
+        for ai_results, text_analysis, model_status, _ in self.iter_analysis(text, model_keys, deadline, lane):
+            pass
+        return ai_results, text_analysis, model_status
+    
+    def iter_analysis(self, text: Union[str, Document], model_keys: Tuple[str, ...] = ANALYSIS_MODELS,
+                      deadline: Optional[float] = None,
+                      lane: str = "interactive") -> Iterator[Tuple[Dict, Dict, Dict, List[str]]]:
+        """run_analysis, yielding a snapshot each time a model call finishes
+
+        Snapshots are (ai_results, text_analysis, model_status, pending model
+        keys). The first comes as soon as pattern analysis is done and holds
+        only cached model results; the last has nothing pending.
+        """
+        if deadline is None:
+            deadline = time.monotonic() + Config.ANALYSIS_DEADLINE
+        document = Document.of(text)
+        
+        model_status = {}
+        text_analysis = None
+        if Config.CASCADE_ENABLED:
+            # Patterns first: they decide which model calls are worth making
+            text_analysis = self.analyze_text_patterns(document)
+            model_keys = self._cascade(text_analysis, model_keys, model_status)
         
+        # Only models without a cached result are called
+        text_hash = document.fingerprint
+        ai_results = {}
+        pending = {}
+        for model_key in self._plan_calls(model_keys, text_hash, deadline, ai_results, model_status):
+            pending[self._start_model_call(model_key, document.text, text_hash, deadline, lane)] = model_key
+        
+        if text_analysis is None:
+            text_analysis = self.analyze_text_patterns(document)
+        yield dict(ai_results), text_analysis, dict(model_status), list(pending.values())
+        
+        try:
+            for future in as_completed(list(pending), timeout=max(0, deadline - time.monotonic())):
+                self._record_outcome(pending.pop(future), future, ai_results, model_status)
+                yield dict(ai_results), text_analysis, dict(model_status), list(pending.values())
+        except FuturesTimeoutError:
+            for future, model_key in pending.items():
+                future.cancel()
+                logger.warning(f"Model {model_key} missed the analysis deadline")
+                model_status[model_key] = "deadline"
+            pending.clear()
+            yield dict(ai_results), text_analysis, dict(model_status), []
+        finally:
+            # The consumer stopped early (e.g. a streaming client went away)
+            for future in pending:
+                future.cancel()
+    
+    def _plan_calls(self, model_keys: Tuple[str, ...], text_hash: str, deadline: float,
+                    ai_results: Dict, model_status: Dict) -> List[str]:
+        """Models to call for a text, after using cached results and rerouting degraded models
+
+        A rerouted model gets the status "rerouted" and its fallback is called
+        (or served from the cache) in its place.
+        """
+        to_call = []
+        for model_key in model_keys:
+            target = model_key
+            cached = self._cached_result(model_key, text_hash)
+            if cached is None:
+                target = self._route(model_key, deadline)
+                if target != model_key:
+                    model_status[model_key] = "rerouted"
+                    if target in to_call or target in model_status:
+                        continue  # Already covered for this text
+                    cached = self._cached_result(target, text_hash)
+            if cached is not None:
+                ai_results[MODELS[target]["purpose"]] = cached
+                model_status[target] = "cached"
+            else:
+                to_call.append(target)
+        return to_call
+    
+    def _route(self, model_key: str, deadline: Optional[float]) -> str:
+        """The model to call in place of model_key: itself unless it is degraded and a fallback is not"""
+        reason = self._degraded(model_key, deadline)
+        if reason is None or not Config.ROUTING_ENABLED:
+            return model_key
+        for fallback in model_fallbacks(model_key):
+            if self._degraded(fallback, deadline) is None:
+                logger.info(f"Routing {model_key} call to {fallback}: {reason}")
+                route = f"{model_key}->{fallback}"
+                with self._stats_lock:
+                    self.route_counts[route] = self.route_counts.get(route, 0) + 1
+                return fallback
+        # No healthy fallback: the call (or the model's breaker) decides
+        return model_key
+    
+    def _degraded(self, model_key: str, deadline: Optional[float]) -> Optional[str]:
+        """Why a call to the model is likely wasted right now, or None if it looks healthy
+
+        Decided from the breaker and the model's averaged failure rate and
+        latency, before any time is spent on the call.
+        """
+        breaker = self.breakers[model_key]
+        if breaker.is_open():
+            return "circuit_open"
+        failure_rate, latency = breaker.health()
+        if failure_rate >= Config.ROUTE_FAILURE_RATE:
+            return "failing"
+        if latency is not None and self._remaining(deadline, latency) < latency:
+            return "too_slow"
         return None
     
-    def analyze_text_patterns(self, text: str) -> Dict:
-        """Comprehensive text pattern analysis"""
-        text_lower = text.lower()
-        words = text.split()
+    def _cascade(self, text_analysis: Dict, model_keys: Tuple[str, ...], model_status: Dict) -> Tuple[str, ...]:
+        """The models whose result could still flip is_credible; the rest are marked "skipped"
+
+        A model's signal only enters the score through the rule table, so
+        trying it at the values where the table's rules for it change (see
+        RuleTable.signal_values) covers every reachable score. A model is
+        needed when, for some values of the other models, its own value changes
+        the verdict. Signals scored continuously (delta_per_unit) are never
+        skipped.
+        """
+        table = self.scoring_rules.current()
+        signals = {model_key: PURPOSE_SIGNALS.get(MODELS[model_key]["purpose"]) for model_key in model_keys}
+        variable = [model_key for model_key in model_keys if signals[model_key]]
+        candidates = {model_key: table.signal_values(signals[model_key]) for model_key in variable}
+        features = {
+            name: value for section in TEXT_ANALYSIS_SECTIONS for name, value in text_analysis[section].items()
+        }
+        features.update(toxicity_score=0, sentiment_score=0)
+        verdicts = {}
         
-        analysis = {
-            "basic_stats": {
-                "length": len(text),
-                "word_count": len(words),
-                "sentence_count": len(re.findall(r'[.!?]+', text)),
-                "avg_word_length": sum(len(word) for word in words) / len(words) if words else 0
-            },
-            "punctuation_analysis": {
-                "exclamation_marks": text.count('!'),
-                "question_marks": text.count('?'),
-                "ellipses": text.count('...'),
-                "quotes": text.count('"') + text.count("'")
-            },
-            "formatting_flags": {
-                "all_caps_words": len([word for word in words if word.isupper() and len(word) > 2]),
-                "repeated_chars": len(re.findall(r'(.)\1{2,}', text)),
-                "excessive_punctuation": len(re.findall(r'[!?]{2,}', text))
-            },
-            "content_flags": {
-                "numbers": len(re.findall(r'\d+', text)),
-                "urls": len(re.findall(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', text)),
-                "mentions": len(re.findall(r'@\w+', text))
-            }
+        def verdict(values: Tuple[float, ...]) -> bool:
+            if values not in verdicts:
+                scored = dict(features)
+                for model_key, value in zip(variable, values):
+                    scored[signals[model_key]] = value
+                verdicts[values] = table.score(scored)["is_credible"]
+            return verdicts[values]
+        
+        if any(values is None for values in candidates.values()):
+            needed = variable
+        else:
+            needed = []
+            for position, model_key in enumerate(variable):
+                others = [candidates[other] for other in variable if other != model_key]
+                for other_values in itertools.product(*others):
+                    outcomes = {verdict(other_values[:position] + (value,) + other_values[position:])
+                                for value in candidates[model_key]}
+                    if len(outcomes) > 1:
+                        needed.append(model_key)
+                        break
+        
+        skipped = [model_key for model_key in model_keys if model_key not in needed]
+        for model_key in skipped:
+            model_status[model_key] = "skipped"
+        with self._stats_lock:
+            self.cascade_stats["analyses"] += 1
+            self.cascade_stats["calls_skipped"] += len(skipped)
+            self.cascade_stats["latency_saved_s"] += self.cascade_savings(skipped, needed)["estimated_latency_saved_ms"] / 1000
+        return tuple(needed)
+    
+    def cascade_savings(self, skipped: List[str], made: List[str]) -> Dict:
+        """Calls a cascade skipped and the wall time that saved, from median model latencies
+
+        Calls run in parallel, so the saving is how much longer the slowest
+        skipped call usually takes than the slowest call still made.
+        """
+        def median_s(model_key):
+            return self.latency[model_key].percentile(50) or 0.0
+        
+        slowest_skipped = max((median_s(model_key) for model_key in skipped), default=0.0)
+        slowest_made = max((median_s(model_key) for model_key in made), default=0.0)
+        return {
+            "skipped_models": skipped,
+            "calls_saved": len(skipped),
+            "estimated_latency_saved_ms": round(max(0.0, slowest_skipped - slowest_made) * 1000, 1)
         }
+    
+    @classmethod
+    def _record_outcome(cls, model_key: str, future, ai_results: Dict, model_status: Dict):
+        """Fold a finished model call (future or task) into the results and statuses"""
+        model_status[model_key], result = cls._call_outcome(model_key, future)
+        if result:
+            ai_results[MODELS[model_key]["purpose"]] = result
+    
+    @staticmethod
+    def _call_outcome(model_key: str, future) -> Tuple[str, Optional[Dict]]:
+        """(status, result) of a finished model call"""
+        try:
+            return "ok", future.result()
+        except ModelUnavailable as e:
+            return e.reason, None
+        except Exception as e:
+            logger.error(f"Model call for {model_key} failed: {e}")
+            return "error", None
+    
+    def run_long_analysis(self, text: Union[str, Document], model_keys: Tuple[str, ...] = ANALYSIS_MODELS,
+                          deadline: Optional[float] = None,
+                          lane: str = "interactive") -> Tuple[Dict, Dict, Dict, Dict]:
+        """run_analysis for documents longer than one model input
+
+        The text is split into sentence-aligned windows, at most
+        LONG_DOC_MAX_WINDOWS of which go to the models. At most
+        LONG_DOC_MAX_IN_FLIGHT window calls run at a time (batched when
+        batching is on), so one long document leaves the shared pool to other
+        requests. Pattern analysis runs on the whole text while the calls are
+        in flight. Also returns a summary of the windowing.
+        """
+        if deadline is None:
+            deadline = time.monotonic() + Config.LONG_DOC_DEADLINE
+        document = Document.of(text)
+        windows = split_windows(document, Config.LONG_DOC_WINDOW_CHARS)
+        chosen = spread_sample(windows, Config.LONG_DOC_MAX_WINDOWS)
+        
+        outcomes = {}
+        queued = deque()
+        for index, window in enumerate(chosen):
+            text_hash = text_fingerprint(window)
+            for model_key in model_keys:
+                cached = self._cached_result(model_key, text_hash)
+                if cached is not None:
+                    outcomes[model_key, index] = ("cached", cached)
+                else:
+                    queued.append((model_key, index, window, text_hash))
+        
+        in_flight = {}
+        
+        def start_queued():
+            while queued and len(in_flight) < Config.LONG_DOC_MAX_IN_FLIGHT:
+                model_key, index, window, text_hash = queued.popleft()
+                in_flight[self._start_model_call(model_key, window, text_hash, deadline, lane)] = (model_key, index)
+        
+        start_queued()
+        text_analysis = self.analyze_text_patterns(document)
         
-        # Pattern matching for fake news indicators
+        while in_flight:
+            done, _ = wait(in_flight, timeout=max(0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                call = in_flight.pop(future)
+                outcomes[call] = self._call_outcome(call[0], future)
+            start_queued()
+        for future, call in in_flight.items():
+            future.cancel()
+            outcomes[call] = ("deadline", None)
+        for model_key, index, _, _ in queued:
+            outcomes[model_key, index] = ("deadline", None)
+        
+        ai_results, model_status = self._aggregate_windows(model_keys, chosen, outcomes)
+        document = {"windows_total": len(windows), "windows_analyzed": len(chosen),
+                    "window_chars": Config.LONG_DOC_WINDOW_CHARS}
+        return ai_results, text_analysis, model_status, document
+    
+    @staticmethod
+    def _aggregate_windows(model_keys: Tuple[str, ...], windows: List[str],
+                           outcomes: Dict[Tuple[str, int], Tuple[str, Optional[Dict]]]) -> Tuple[Dict, Dict]:
+        """Combine per-window results into one document-level result per model
+
+        Toxicity keeps the scores of the most toxic window, so one toxic passage
+        marks the document; other classifiers average each label over the
+        windows, weighted by window length. Models with no label scores (text
+        generation) keep their first window's result. A model answered for only
+        some windows has status "partial".
+        """
+        ai_results = {}
+        model_status = {}
+        for model_key in model_keys:
+            purpose = MODELS[model_key]["purpose"]
+            window_outcomes = [outcomes[model_key, index] for index in range(len(windows))]
+            answered = [(index, result) for index, (status, result) in enumerate(window_outcomes)
+                        if status in ("ok", "cached") and result]
+            statuses = {status for status, _ in window_outcomes}
+            if not answered:
+                failures = statuses - {"ok", "cached"}
+                model_status[model_key] = sorted(failures)[0] if failures else "ok"
+                continue
+            if len(answered) < len(windows):
+                model_status[model_key] = "partial"
+            else:
+                model_status[model_key] = "cached" if statuses == {"cached"} else "ok"
+            
+            window_scores = [(index, label_scores(result)) for index, result in answered]
+            if not any(scores for _, scores in window_scores):
+                ai_results[purpose] = answered[0][1]
+                continue
+            if purpose == "toxicity_detection":
+                totals = max((scores for _, scores in window_scores), key=toxicity_level)
+            else:
+                totals = {}
+                weight = sum(len(windows[index]) for index, _ in window_scores)
+                for index, scores in window_scores:
+                    for label, score in scores.items():
+                        totals[label] = totals.get(label, 0) + score * len(windows[index]) / weight
+            ranked = sorted(totals.items(), key=lambda item: item[1], reverse=True)
+            # Same shape as a single-text classification response
+            ai_results[purpose] = [[{"label": label, "score": round(score, 6)} for label, score in ranked]]
+        return ai_results, model_status
+    
+    def analyze_text_patterns(self, text: Union[str, Document]) -> Dict:
+        """Comprehensive text pattern analysis"""
+        document = Document.of(text)
+        analysis = dict(document.features)
+        
+        # Pattern matching for fake news indicators: one pass for every phrase list
+        pattern_hits = PATTERN_MATCHER.scan(document.lower)
         analysis["fake_indicators"] = {
-            "clickbait_count": sum(1 for phrase in FAKE_NEWS_PATTERNS["clickbait_phrases"] if phrase in text_lower),
-            "sensational_words": sum(1 for word in FAKE_NEWS_PATTERNS["sensational_words"] if word in text_lower),
-            "emotional_triggers": sum(1 for trigger in FAKE_NEWS_PATTERNS["emotional_triggers"] if trigger in text_lower)
+            column: pattern_hits[category]["count"] for column, category in INDICATOR_CATEGORIES.items()
         }
+        # Offsets into the lowercased text
+        analysis["pattern_matches"] = {category: hits["matches"] for category, hits in pattern_hits.items()}
         
         return analysis
     
@@ -166,111 +2851,673 @@ class NewsAnalyzer:
             "confidence_factors": []
         }
         
-        # Process toxicity results
-        if "toxicity" in ai_results and ai_results["toxicity"]:
+        # Process toxicity results (ai_results is keyed by model purpose)
+        if ai_results.get("toxicity_detection"):
             try:
-                toxicity_data = ai_results["toxicity"]
-                if isinstance(toxicity_data, list) and toxicity_data:
-                    if isinstance(toxicity_data[0], dict):
-                        for item in toxicity_data[0]:
-                            if isinstance(item, dict) and "label" in item:
-                                label = item["label"].lower()
-                                score = item.get("score", 0)
-                                if "toxic" in label or "fake" in label:
-                                    processed["toxicity_score"] = max(processed["toxicity_score"], score)
-                                    if score > 0.7:
-                                        processed["confidence_factors"].append("High toxicity detected")
+                scores = label_scores(ai_results["toxicity_detection"])
+                toxic = {label: score for label, score in scores.items()
+                         if "toxic" in label.lower() or "fake" in label.lower()}
+                processed["toxicity_score"] = toxicity_level(toxic)
+                if processed["toxicity_score"] > 0.7:
+                    processed["confidence_factors"].append("High toxicity detected")
             except Exception as e:
                 logger.error(f"Error processing toxicity results: {e}")
         
-        # Process sentiment results
-        if "sentiment" in ai_results and ai_results["sentiment"]:
+        # Process sentiment results: the top-ranked label. sentiment_score measures how
+        # polarized the text is, so a neutral verdict leaves it at 0 however confident.
+        if ai_results.get("sentiment_analysis"):
             try:
-                sentiment_data = ai_results["sentiment"]
-                if isinstance(sentiment_data, list) and sentiment_data:
-                    for item in sentiment_data:
-                        if isinstance(item, dict) and "label" in item:
-                            label = item["label"].lower()
-                            score = item.get("score", 0)
-                            processed["sentiment_label"] = label
-                            processed["sentiment_score"] = score
-                            if ("negative" in label and score > 0.8) or ("positive" in label and score > 0.9):
-                                processed["confidence_factors"].append("Extreme emotional bias detected")
+                scores = label_scores(ai_results["sentiment_analysis"])
+                if scores:
+                    label, score = max(scores.items(), key=lambda item: item[1])
+                    label = label.lower()
+                    processed["sentiment_label"] = label
+                    if "negative" in label or "positive" in label:
+                        processed["sentiment_score"] = score
+                    if ("negative" in label and score > 0.8) or ("positive" in label and score > 0.9):
+                        processed["confidence_factors"].append("Extreme emotional bias detected")
             except Exception as e:
                 logger.error(f"Error processing sentiment results: {e}")
         
         return processed
     
     def calculate_credibility_score(self, text_analysis: Dict, ai_processed: Dict) -> Dict:
-        """Advanced credibility scoring algorithm"""
-        credibility_score = 50  # Start neutral
-        risk_factors = []
-        positive_factors = []
+        """Credibility score from the pattern analysis and model results, by the current rule table"""
+        features = {
+            name: value for section in TEXT_ANALYSIS_SECTIONS for name, value in text_analysis[section].items()
+        }
+        features["toxicity_score"] = ai_processed["toxicity_score"]
+        features["sentiment_score"] = ai_processed["sentiment_score"]
+        result = self.scoring_rules.current().score(features)
+        result["analysis_timestamp"] = datetime.now().isoformat()
+        return result
+    
+    def calculate_credibility_scores(self, features: Dict[str, "np.ndarray"],
+                                     toxicity_scores: Optional["np.ndarray"] = None,
+                                     sentiment_scores: Optional["np.ndarray"] = None) -> Dict[str, "np.ndarray"]:
+        """calculate_credibility_score for a whole extract_feature_matrix result at once
+
+        Model scores are optional arrays; without them every text is scored like
+        heuristics-only bulk analysis (toxicity 0, sentiment 0.5). Returns
+        credibility_score, is_credible and confidence arrays equal to the
+        per-text results, and the rules that fired (see RuleTable.score_batch).
+        """
+        count = len(features["length"])
+        features = dict(features)
+        features["toxicity_score"] = (np.zeros(count) if toxicity_scores is None
+                                      else np.asarray(toxicity_scores, dtype=float))
+        features["sentiment_score"] = (np.full(count, 0.5) if sentiment_scores is None
+                                       else np.asarray(sentiment_scores, dtype=float))
+        return self.scoring_rules.current().score_batch(features)
+
+class AsyncNewsAnalyzer(NewsAnalyzer):
+    """Event-loop variant of NewsAnalyzer for the ASGI serving mode
+
+    Model calls are coroutines on a pooled httpx.AsyncClient, so a single
+    process can hold thousands of pending calls without a thread per call.
+    Pattern analysis and scoring are shared with NewsAnalyzer.
+    """
+    
+    def __init__(self):
+        if httpx is None:
+            raise RuntimeError("httpx is required for the async analyzer: pip install httpx")
+        super().__init__()
+        self._client = None
+        self._inflight_tasks = {}
+    
+    @property
+    def client(self) -> "httpx.AsyncClient":
+        """Pooled HTTP client, created lazily on the running event loop"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                http2=Config.HTTP2_ENABLED,
+                headers=dict(self.session.headers),
+                limits=httpx.Limits(
+                    max_connections=Config.ASYNC_MAX_CONNECTIONS,
+                    max_keepalive_connections=Config.ASYNC_MAX_KEEPALIVE,
+                    keepalive_expiry=Config.POOL_IDLE_TIMEOUT
+                )
+            )
+        return self._client
+    
+    async def aclose(self):
+        """Release pooled connections"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    def _cached_result(self, model_key: str, text_hash: str) -> Optional[Dict]:
+        """Memory tier only: a disk read can wait seconds on SQLite locks and would block the event loop
+
+        Callers load disk hits into memory beforehand with _load_disk_results.
+        """
+        return self.result_cache.get(self._cache_key(model_key, text_hash))
+    
+    async def _load_disk_results(self, lookups: List[Tuple[str, str]]):
+        """Promote disk cache hits for (model_key, text_hash) pairs into memory, off the event loop"""
+        if self.disk_cache is None or not lookups:
+            return
+        await asyncio.get_running_loop().run_in_executor(
+            self.executor, lambda: [NewsAnalyzer._cached_result(self, *lookup) for lookup in lookups]
+        )
+    
+    async def call_huggingface_api(self, model_key: str, text: str, deadline: Optional[float] = None,
+                                   lane: str = "interactive") -> Optional[Dict]:
+        """Model result for a text, served from the result caches when possible"""
+        text_hash = text_fingerprint(text)
+        await self._load_disk_results([(model_key, text_hash)])
+        cached = self._cached_result(model_key, text_hash)
+        if cached is not None:
+            return cached
+        try:
+            return await self._coalesced_fetch(model_key, text, text_hash, deadline, lane)
+        except ModelUnavailable:
+            return None
+    
+    async def _coalesced_fetch(self, model_key: str, text: str, text_hash: str,
+                               deadline: Optional[float], lane: str = "interactive") -> Optional[Dict]:
+        """Share one in-flight call between identical concurrent requests"""
+        key = self._cache_key(model_key, text_hash)
+        task = self._inflight_tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch_model_result(model_key, text, text_hash, deadline, lane))
+            self._inflight_tasks[key] = task
+            task.add_done_callback(
+                lambda t: self._inflight_tasks.pop(key) if self._inflight_tasks.get(key) is t else None
+            )
+            # Every waiter may have given up at its deadline; retrieve the outcome so
+            # a late failure is not reported as "Task exception was never retrieved"
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self.single_flight.leaders += 1
+        else:
+            self.single_flight.followers += 1
+        # Shielded so a caller reaching its deadline does not cancel the shared call
+        return await asyncio.shield(task)
+    
+    async def _fetch_model_result(self, model_key: str, text: str, text_hash: str,
+                                  deadline: Optional[float], lane: str = "interactive") -> Optional[Dict]:
+        """Call the model and cache a successful result"""
+        if model_key in self.batchers:
+            # Batches are shared with the thread-based dispatcher and cached by its callback.
+            # _launch_model_call asks the breaker itself: asking twice would use up a half-open probe.
+            return await asyncio.wrap_future(self._launch_model_call(model_key, text, text_hash, deadline, lane))
+        if not self.breakers[model_key].allow():
+            raise ModelUnavailable(model_key, "circuit_open")
+        result = await self._request_model(model_key, text, deadline, lane)
+        if result is not None:
+            # Disk writes can wait on other workers' locks, so keep them off the event loop
+            await asyncio.get_running_loop().run_in_executor(
+                self.executor, self._store_result, model_key, text_hash, result
+            )
+        return result
+    
+    async def _request_model(self, model_key: str, inputs: Union[str, List[str]],
+                             deadline: Optional[float] = None, lane: str = "interactive") -> Optional[Dict]:
+        """Async API call with the same retry and deadline rules as the sync analyzer"""
+        if self.local_backend is not None and self.local_backend.supports(model_key):
+            # CPU-bound: run on the executor rather than the event loop
+            return await asyncio.wrap_future(self._start_request(model_key, inputs, deadline))
+        model_info = MODELS[model_key]
+        url = f"{Config.HF_API_URL}{model_info['name']}"
+        payload = {"inputs": inputs}
         
-        # Text pattern analysis
-        fake_indicators = text_analysis["fake_indicators"]
-        basic_stats = text_analysis["basic_stats"]
-        punctuation = text_analysis["punctuation_analysis"]
-        formatting = text_analysis["formatting_flags"]
-        
-        # Clickbait and sensational content
-        if fake_indicators["clickbait_count"] > 0:
-            penalty = fake_indicators["clickbait_count"] * 15
-            credibility_score -= penalty
-            risk_factors.append(f"Contains {fake_indicators['clickbait_count']} clickbait phrases")
-        
-        if fake_indicators["sensational_words"] > 2:
-            credibility_score -= 10
-            risk_factors.append("Heavy use of sensational language")
-        
-        # Formatting red flags
-        if formatting["all_caps_words"] > 2:
-            credibility_score -= 8
-            risk_factors.append("Excessive capitalization")
-        
-        if punctuation["exclamation_marks"] > 3:
-            credibility_score -= 5
-            risk_factors.append("Overuse of exclamation marks")
-        
-        # Length and structure analysis
-        if basic_stats["word_count"] < 10:
-            credibility_score -= 10
-            risk_factors.append("Too brief for credible reporting")
-        elif basic_stats["word_count"] > 100:
-            credibility_score += 5
-            positive_factors.append("Substantial content length")
-        
-        # Quote analysis (indicates sources)
-        if punctuation["quotes"] > 0:
-            credibility_score += 8
-            positive_factors.append("Contains quoted sources")
-        
-        # AI model results
-        if ai_processed["toxicity_score"] > 0.7:
-            credibility_score -= 20
-            risk_factors.append("AI detected toxic/misleading patterns")
-        
-        if ai_processed["sentiment_score"] > 0.85:
-            credibility_score -= 10
-            risk_factors.append("Extreme emotional bias")
-        
-        # Normalize score
-        credibility_score = max(0, min(100, credibility_score))
+        for attempt in range(Config.MAX_RETRIES):
+            timeout = self._remaining(deadline, self._attempt_timeout(model_key, attempt))
+            if timeout <= 0:
+                logger.warning(f"Deadline reached before calling {model_key}")
+                raise ModelUnavailable(model_key, "deadline")
+            await self._acquire_token(model_key, deadline, lane)
+            breaker = self.breakers[model_key]
+            started = time.monotonic()
+            try:
+                response = await self._post_hedged(model_key, url, payload, timeout, lane)
+            except httpx.TimeoutException:
+                logger.warning(f"Request timeout on attempt {attempt + 1}")
+                breaker.record(False, time.monotonic() - started)
+                await self._wait_to_retry(model_key, deadline, attempt, 1, "timeout")
+                continue
+            except Exception as e:
+                logger.error(f"Request error: {str(e)}")
+                breaker.record(False, time.monotonic() - started)
+                raise ModelUnavailable(model_key, "error", str(e))
+            
+            if response.status_code == 200:
+                logger.info(f"Successful API call to {model_key}")
+                latency = time.monotonic() - started
+                breaker.record(True, latency)
+                self.latency[model_key].record(latency)
+                self.warmth.success(model_key)
+                return response.json()
+            elif response.status_code in (429, 503):
+                if response.status_code == 503:
+                    self.warmth.loading(model_key)
+                await self._wait_to_retry(model_key, deadline, attempt, self._loading_wait(response, attempt),
+                                          "loading" if response.status_code == 503 else "rate_limited")
+            else:
+                logger.error(f"API Error {response.status_code}: {response.text}")
+                breaker.record(False, time.monotonic() - started)
+                raise ModelUnavailable(model_key, "error", f"HTTP {response.status_code}")
         
-        # Calculate confidence based on analysis depth
-        confidence = min(90, 60 + len(risk_factors + positive_factors) * 5)
+        raise ModelUnavailable(model_key, "error", "retries exhausted")
+    
+    async def _acquire_token(self, model_key: str, deadline: Optional[float], lane: str):
+        """Wait for a rate limiter token, or give up now if the deadline cannot allow the wait"""
+        while True:
+            wait_time = await self._try_acquire(model_key, lane)
+            if wait_time == 0:
+                return
+            if self._remaining(deadline, wait_time) < wait_time:
+                logger.warning(f"Model {model_key} rate limited, no time left to wait {wait_time:.1f}s")
+                raise ModelUnavailable(model_key, "rate_limited")
+            await asyncio.sleep(wait_time)
+    
+    async def _try_acquire(self, model_key: str, lane: str) -> float:
+        """rate_limiter.try_acquire off the event loop: it takes a cross-process file lock"""
+        if not self.rate_limiter.enabled:
+            return 0.0
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, self.rate_limiter.try_acquire, model_key, lane
+        )
+    
+    async def _post_hedged(self, model_key: str, url: str, payload: Dict, timeout: float,
+                           lane: str = "interactive"):
+        """POST, racing a duplicate against the call once it is slower than the model's tail latency"""
+        first = asyncio.ensure_future(self.client.post(url, json=payload, timeout=timeout))
+        if not Config.HEDGE_ENABLED:
+            return await first
+        self.hedge_budget.earn()
+        delay = self.latency[model_key].hedge_delay()
+        if delay is None or delay >= timeout:
+            return await first
+        done, _ = await asyncio.wait({first}, timeout=delay)
+        if done or not self.hedge_budget.spend():
+            return await first
+        if await self._try_acquire(model_key, lane) > 0:
+            return await first  # Hedges never wait for a token
         
-        return {
-            "credibility_score": credibility_score,
-            "is_credible": credibility_score >= 50,
-            "confidence": confidence,
-            "risk_factors": risk_factors,
-            "positive_factors": positive_factors,
-            "analysis_timestamp": datetime.now().isoformat()
-        }
+        logger.info(f"Hedging slow call to {model_key}")
+        second = asyncio.ensure_future(self.client.post(url, json=payload, timeout=timeout - delay))
+        pending = {first, second}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None and task.result().status_code == 200:
+                        if task is second:
+                            self.hedge_budget.won()
+                        return task.result()
+            # Neither attempt succeeded: report the original attempt's outcome
+            return first.result()
+        finally:
+            for task in pending:
+                task.cancel()
+    
+    async def _wait_to_retry(self, model_key: str, deadline: Optional[float], attempt: int,
+                             wait_time: float, reason: str):
+        """Sleep before the next attempt, or give up now if the deadline cannot allow it"""
+        if self.breakers[model_key].is_open():
+            raise ModelUnavailable(model_key, "circuit_open")
+        if attempt + 1 >= Config.MAX_RETRIES or self._remaining(deadline, wait_time) < wait_time:
+            logger.warning(f"Model {model_key} {reason}, no time left to wait {wait_time:.1f}s")
+            raise ModelUnavailable(model_key, reason)
+        logger.warning(f"Model {model_key} {reason}, retrying in {wait_time:.1f}s")
+        await asyncio.sleep(wait_time)
+    
+    async def run_analysis(self, text: Union[str, Document], model_keys: Tuple[str, ...] = ANALYSIS_MODELS,
+                           deadline: Optional[float] = None, lane: str = "interactive") -> Tuple[Dict, Dict, Dict]:
+        """Await all model calls concurrently and run pattern analysis while they are in flight"""
+        async for ai_results, text_analysis, model_status, _ in self.iter_analysis(text, model_keys, deadline, lane):
+            pass
+        return ai_results, text_analysis, model_status
+    
+    async def iter_analysis(self, text: Union[str, Document], model_keys: Tuple[str, ...] = ANALYSIS_MODELS,
+                            deadline: Optional[float] = None,
+                            lane: str = "interactive") -> AsyncIterator[Tuple[Dict, Dict, Dict, List[str]]]:
+        """Async counterpart of NewsAnalyzer.iter_analysis"""
+        if deadline is None:
+            deadline = time.monotonic() + Config.ANALYSIS_DEADLINE
+        document = Document.of(text)
+        
+        model_status = {}
+        text_analysis = None
+        if Config.CASCADE_ENABLED:
+            text_analysis = self.analyze_text_patterns(document)
+            model_keys = self._cascade(text_analysis, model_keys, model_status)
+        
+        # Only models without a cached result are called
+        text_hash = document.fingerprint
+        await self._load_disk_results([
+            (candidate, text_hash) for model_key in model_keys
+            for candidate in (model_key, *model_fallbacks(model_key))
+        ])
+        ai_results = {}
+        pending = {}
+        for model_key in self._plan_calls(model_keys, text_hash, deadline, ai_results, model_status):
+            task = asyncio.ensure_future(self._coalesced_fetch(model_key, document.text, text_hash, deadline, lane))
+            pending[task] = model_key
+        # Let the calls get onto the wire before doing CPU work
+        await asyncio.sleep(0)
+        
+        if text_analysis is None:
+            text_analysis = self.analyze_text_patterns(document)
+        yield dict(ai_results), text_analysis, dict(model_status), list(pending.values())
+        
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, timeout=max(0, deadline - time.monotonic()),
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    for task, model_key in pending.items():
+                        task.cancel()
+                        logger.warning(f"Model {model_key} missed the analysis deadline")
+                        model_status[model_key] = "deadline"
+                    pending.clear()
+                for task in done:
+                    self._record_outcome(pending.pop(task), task, ai_results, model_status)
+                yield dict(ai_results), text_analysis, dict(model_status), list(pending.values())
+        finally:
+            for task in pending:
+                task.cancel()
 
-# Initialize analyzer
-analyzer = NewsAnalyzer()
+    async def run_long_analysis(self, text: Union[str, Document],
+                                model_keys: Tuple[str, ...] = ANALYSIS_MODELS,
+                                deadline: Optional[float] = None,
+                                lane: str = "interactive") -> Tuple[Dict, Dict, Dict, Dict]:
+        """Async counterpart of NewsAnalyzer.run_long_analysis"""
+        if deadline is None:
+            deadline = time.monotonic() + Config.LONG_DOC_DEADLINE
+        document = Document.of(text)
+        windows = split_windows(document, Config.LONG_DOC_WINDOW_CHARS)
+        chosen = spread_sample(windows, Config.LONG_DOC_MAX_WINDOWS)
+        hashes = [text_fingerprint(window) for window in chosen]
+        await self._load_disk_results([(model_key, text_hash) for text_hash in hashes for model_key in model_keys])
+        
+        # Caps this document's calls in flight, as in the sync version
+        in_flight = asyncio.Semaphore(Config.LONG_DOC_MAX_IN_FLIGHT)
+        
+        async def fetch_window(model_key: str, window: str, text_hash: str):
+            async with in_flight:
+                return await self._coalesced_fetch(model_key, window, text_hash, deadline, lane)
+        
+        outcomes = {}
+        tasks = {}
+        for index, (window, text_hash) in enumerate(zip(chosen, hashes)):
+            for model_key in model_keys:
+                cached = self._cached_result(model_key, text_hash)
+                if cached is not None:
+                    outcomes[model_key, index] = ("cached", cached)
+                else:
+                    tasks[model_key, index] = asyncio.ensure_future(fetch_window(model_key, window, text_hash))
+        # Let the calls get onto the wire before doing CPU work
+        await asyncio.sleep(0)
+        
+        text_analysis = self.analyze_text_patterns(document)
+        
+        done = set()
+        if tasks:
+            done, pending = await asyncio.wait(tasks.values(), timeout=max(0, deadline - time.monotonic()))
+            for task in pending:
+                task.cancel()
+        for call, task in tasks.items():
+            outcomes[call] = self._call_outcome(call[0], task) if task in done else ("deadline", None)
+        
+        ai_results, model_status = self._aggregate_windows(model_keys, chosen, outcomes)
+        document = {"windows_total": len(windows), "windows_analyzed": len(chosen),
+                    "window_chars": Config.LONG_DOC_WINDOW_CHARS}
+        return ai_results, text_analysis, model_status, document
+
+# Request handling shared by the Flask routes and the ASGI app (asgi.py)
+def parse_check_request(data: Optional[Dict],
+                        max_length: Optional[int] = None) -> Tuple[Optional[str], Optional[str]]:
+    """Validate a /check payload, returning (text, error); max_length defaults to MAX_TEXT_LENGTH"""
+    max_length = max_length or Config.MAX_TEXT_LENGTH
+    if not data or 'text' not in data:
+        return None, 'No text provided for analysis'
+    
+    news_text = data['text'].strip()
+    
+    if not news_text:
+        return None, 'Empty text provided'
+    
+    if len(news_text) > max_length:
+        return None, f'Text too long. Please limit to {max_length} characters.'
+    
+    return news_text, None
+
+def build_check_response(news_analyzer: "NewsAnalyzer", ai_results: Dict, text_analysis: Dict,
+                         model_status: Optional[Dict] = None, document: Optional[Dict] = None) -> Dict:
+    """Score the analysis results and shape the /check response
+
+    document is the windowing summary of a long-document analysis.
+    """
+    model_status = model_status or {}
+    # Process AI results
+    ai_processed = news_analyzer.process_ai_results(ai_results)
+    
+    # Calculate final credibility score
+    final_analysis = news_analyzer.calculate_credibility_score(text_analysis, ai_processed)
+    
+    # Prepare comprehensive response
+    response = {
+        'classification': 'CREDIBLE' if final_analysis['is_credible'] else 'SUSPICIOUS',
+        'confidence': final_analysis['confidence'],
+        'credibility_score': final_analysis['credibility_score'],
+        'isReal': final_analysis['is_credible'],
+        'explanation': '. '.join(final_analysis['risk_factors'][:3]) if final_analysis['risk_factors'] else 'Analysis shows standard content patterns',
+        'analysis_details': {
+            'risk_factors': final_analysis['risk_factors'],
+            'positive_factors': final_analysis['positive_factors'],
+            'text_stats': text_analysis['basic_stats'],
+            'ai_models_used': list(ai_results.keys()),
+            'model_status': model_status,
+            'degraded': any(status not in ('ok', 'cached', 'skipped') for status in model_status.values()),
+            'timestamp': final_analysis['analysis_timestamp']
+        },
+        'ai_powered': True
+    }
+    if document is not None:
+        response['analysis_details']['document'] = document
+    routes = {
+        model_key: next((fallback for fallback in model_fallbacks(model_key) if fallback in model_status), None)
+        for model_key, status in model_status.items() if status == 'rerouted'
+    }
+    if routes:
+        response['analysis_details']['routes'] = routes
+    if 'skipped' in model_status.values():
+        response['analysis_details']['cascade'] = news_analyzer.cascade_savings(
+            [model_key for model_key, status in model_status.items() if status == 'skipped'],
+            [model_key for model_key, status in model_status.items() if status != 'skipped']
+        )
+    return response
+
+def format_sse(event: str, payload: Dict) -> str:
+    """Encode one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+def build_stream_event(news_analyzer: "NewsAnalyzer", ai_results: Dict, text_analysis: Dict,
+                       model_status: Dict, pending: List[str], document: Optional[Dict] = None) -> str:
+    """/check/stream event for an analysis snapshot: partial while models are pending, then final"""
+    payload = build_check_response(news_analyzer, ai_results, text_analysis, model_status, document)
+    payload['pending_models'] = pending
+    return format_sse('partial' if pending else 'final', payload)
+
+STREAM_HEADERS = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+
+def parse_bulk_request(data: Optional[Dict]) -> Tuple[Optional[List[str]], Optional[str]]:
+    """Validate an /analyze/bulk payload, returning (texts, error)"""
+    texts = data.get('texts', []) if data else []
+    
+    if not texts or not isinstance(texts, list):
+        return None, 'No texts array provided'
+    
+    if len(texts) > 10:
+        return None, 'Maximum 10 texts allowed per request'
+    
+    return texts, None
+
+def build_bulk_response(news_analyzer: "NewsAnalyzer", texts: List[str], use_models: bool = False) -> Dict:
+    """Score each text of a bulk request, heuristics-only unless use_models is set
+
+    Model calls made for bulk work go through the "bulk" rate limit lane and
+    share one analysis deadline, so they never delay interactive /check calls.
+    """
+    results = []
+    deadline = time.monotonic() + Config.ANALYSIS_DEADLINE
+    for idx, text in enumerate(texts):
+        if len(text.strip()) > 0:
+            document = Document(text)
+            if use_models:
+                ai_results, text_analysis, _ = news_analyzer.run_analysis(document, deadline=deadline, lane="bulk")
+                ai_processed = news_analyzer.process_ai_results(ai_results)
+            else:
+                # Simplified analysis for bulk processing
+                text_analysis = news_analyzer.analyze_text_patterns(document)
+                ai_processed = {"toxicity_score": 0, "sentiment_score": 0.5, "confidence_factors": []}
+            final_analysis = news_analyzer.calculate_credibility_score(text_analysis, ai_processed)
+            
+            results.append({
+                'index': idx,
+                'text_preview': text[:100] + '...' if len(text) > 100 else text,
+                'classification': 'CREDIBLE' if final_analysis['is_credible'] else 'SUSPICIOUS',
+                'credibility_score': final_analysis['credibility_score'],
+                'confidence': final_analysis['confidence']
+            })
+    
+    return {
+        'results': results,
+        'total_analyzed': len(results),
+        'timestamp': datetime.now().isoformat()
+    }
+
+def build_health_response(news_analyzer: "NewsAnalyzer") -> Dict:
+    """System status reported by /health"""
+    return {
+        'status': 'healthy',
+        'service': 'TruthLens AI (Enhanced)',
+        'models_available': list(MODELS.keys()),
+        'api_token_configured': bool(Config.HF_API_TOKEN),
+        'ready': news_analyzer.warmed_up.is_set(),
+        'models': news_analyzer.warmth.stats(),
+        'result_cache': news_analyzer.result_cache.stats(),
+        'disk_cache': news_analyzer.disk_cache.stats() if news_analyzer.disk_cache else None,
+        'single_flight': news_analyzer.single_flight.stats(),
+        'retry_scheduler': news_analyzer.retry_scheduler.stats(),
+        'connection_pool': news_analyzer.transport.stats(),
+        'hedging': news_analyzer.hedge_budget.stats(),
+        'cascade': {'enabled': Config.CASCADE_ENABLED, **news_analyzer.cascade_stats},
+        'scoring_rules': news_analyzer.scoring_rules.stats(),
+        'rate_limiter': news_analyzer.rate_limiter.stats(),
+        'routing': {'enabled': Config.ROUTING_ENABLED, 'routes_taken': dict(news_analyzer.route_counts)},
+        'circuit_breakers': {model_key: breaker.stats() for model_key, breaker in news_analyzer.breakers.items()},
+        'batching': {model_key: batcher.stats() for model_key, batcher in news_analyzer.batchers.items()},
+        'timestamp': datetime.now().isoformat()
+    }
+
+def build_latency_debug_response(news_analyzer: "NewsAnalyzer") -> Dict:
+    """Latency histograms and the attempt timeouts currently derived from them"""
+    return {
+        'adaptive_timeouts': Config.ADAPTIVE_TIMEOUTS,
+        'models': {
+            model_key: {
+                **tracker.stats(),
+                'histogram': tracker.histogram(),
+                'attempt_timeouts_s': [
+                    round(news_analyzer._attempt_timeout(model_key, attempt), 3)
+                    for attempt in range(Config.MAX_RETRIES)
+                ]
+            }
+            for model_key, tracker in news_analyzer.latency.items()
+        },
+        'timestamp': datetime.now().isoformat()
+    }
+
+def build_ready_response(news_analyzer: "NewsAnalyzer") -> Tuple[Dict, int]:
+    """Readiness for load balancers: 503 until the startup warm-up has finished"""
+    ready = news_analyzer.warmed_up.is_set()
+    return {'ready': ready, 'models': news_analyzer.warmth.stats()}, 200 if ready else 503
+
+def callback_url_error(url: str) -> Optional[str]:
+    """Why a job callback URL may not be used, or None
+
+    Callbacks are requests made on a client's behalf, so unless the host is in
+    JOB_CALLBACK_HOSTS it must resolve to public addresses only.
+    """
+    try:
+        parsed = urlparse(url)
+        port = parsed.port or (443 if parsed.scheme == "https" else 80)
+    except ValueError:
+        return 'callback_url must be an http(s) URL'
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        return 'callback_url must be an http(s) URL'
+    host = parsed.hostname.lower()
+    if Config.JOB_CALLBACK_HOSTS:
+        return None if host in Config.JOB_CALLBACK_HOSTS else 'callback_url host is not allowed'
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, port, proto=socket.IPPROTO_TCP)}
+    except (socket.gaierror, UnicodeError):
+        return 'callback_url host does not resolve'
+    for address in addresses:
+        ip = ipaddress.ip_address(address.split("%")[0])
+        if not ip.is_global or ip.is_multicast:
+            return 'callback_url must point to a public host'
+    return None
+
+def parse_job_request(data: Optional[Dict]) -> Tuple[Optional[Dict], Optional[str]]:
+    """Validate a /jobs payload ("text" or "texts", optional "callback_url"), returning (job, error)"""
+    if not data:
+        return None, 'No texts provided for analysis'
+    texts = data.get('texts', [data['text']] if 'text' in data else [])
+    if not texts or not isinstance(texts, list):
+        return None, 'No texts provided for analysis'
+    if len(texts) > Config.JOB_MAX_TEXTS:
+        return None, f'Maximum {Config.JOB_MAX_TEXTS} texts allowed per job'
+    for text in texts:
+        if not isinstance(text, str) or not text.strip():
+            return None, 'Every text must be a non-empty string'
+        if len(text.strip()) > Config.LONG_DOC_MAX_LENGTH:
+            return None, f'Text too long. Please limit to {Config.LONG_DOC_MAX_LENGTH} characters.'
+    
+    callback_url = data.get('callback_url')
+    if callback_url is not None:
+        if not isinstance(callback_url, str):
+            return None, 'callback_url must be an http(s) URL'
+        error = callback_url_error(callback_url)
+        if error:
+            return None, error
+    
+    return {'texts': [text.strip() for text in texts], 'callback_url': callback_url}, None
+
+def analyze_for_job(news_analyzer: "NewsAnalyzer", text: str) -> Dict:
+    """/check response for one job text; model calls use the bulk rate limit lane"""
+    if len(text) > Config.MAX_TEXT_LENGTH:
+        return build_check_response(news_analyzer, *news_analyzer.run_long_analysis(text, lane="bulk"))
+    ai_results, text_analysis, model_status = news_analyzer.run_analysis(text, lane="bulk")
+    return build_check_response(news_analyzer, ai_results, text_analysis, model_status)
+
+def build_job_response(job: Dict) -> Dict:
+    """Job status as returned by GET /jobs/<id> and sent to callbacks"""
+    def iso(timestamp):
+        return datetime.fromtimestamp(timestamp).isoformat() if timestamp else None
+    
+    return {
+        'job_id': job['id'],
+        'status': job['status'],
+        'total': len(job['texts']),
+        'completed': len(job['results']),
+        'results': job['results'],
+        'error': job['error'],
+        'callback_status': job['callback_status'],
+        'created_at': iso(job['created_at']),
+        'started_at': iso(job['started_at']),
+        'finished_at': iso(job['finished_at'])
+    }
+
+def submit_job(runner: Optional[JobRunner], data: Optional[Dict]) -> Tuple[Dict, int]:
+    """Handle POST /jobs: 202 with the job id, or why the job was refused"""
+    if runner is None:
+        return {'error': 'Job queue is disabled'}, 503
+    job, error = parse_job_request(data)
+    if error:
+        return {'error': error}, 400
+    job_id = runner.submit(job['texts'], job['callback_url'])
+    if job_id is None:
+        return {'error': 'Job queue is full. Please try again later.'}, 429
+    return {'job_id': job_id, 'status': 'queued', 'status_url': f'/jobs/{job_id}'}, 202
+
+def get_job_status(runner: Optional[JobRunner], job_id: str) -> Tuple[Dict, int]:
+    """Handle GET /jobs/<id>"""
+    if runner is None:
+        return {'error': 'Job queue is disabled'}, 503
+    job = runner.store.get(job_id)
+    if job is None:
+        return {'error': 'Job not found'}, 404
+    return build_job_response(job), 200
+
+def start_job_runner(analyze: Callable[[str], Dict]) -> Optional[JobRunner]:
+    """Start the background job queue, unless disabled, with the serving analyzer's analyze(text)"""
+    if not Config.JOBS_DB_PATH:
+        return None
+    runner = JobRunner(JobStore(Config.JOBS_DB_PATH), analyze, Config.JOB_WORKERS)
+    runner.start()
+    return runner
+
+# The Flask app's analyzer and job queue are created on first use, so importing
+# this module (as asgi.py and the tools do) starts no threads and probes no models
+analyzer = None
+job_runner = None
+_analyzer_lock = threading.Lock()
+
+def get_analyzer() -> NewsAnalyzer:
+    """The Flask app's analyzer; the first call also starts its warm-up and the job queue"""
+    global analyzer, job_runner
+    if analyzer is None:
+        with _analyzer_lock:
+            if analyzer is None:
+                news_analyzer = NewsAnalyzer()
+                news_analyzer.start_warmup()
+                job_runner = start_job_runner(lambda text: analyze_for_job(news_analyzer, text))
+                analyzer = news_analyzer
+    return analyzer
 
 @app.route('/')
 def index():
@@ -286,57 +3533,20 @@ def get_samples():
 def check_news():
     """Enhanced news analysis endpoint"""
     try:
-        data = request.get_json()
-        
-        if not data or 'text' not in data:
-            return jsonify({'error': 'No text provided for analysis'}), 400
-        
-        news_text = data['text'].strip()
+        news_text, error = parse_check_request(request.get_json(), Config.LONG_DOC_MAX_LENGTH)
+        if error:
+            return jsonify({'error': error}), 400
         
-        if not news_text:
-            return jsonify({'error': 'Empty text provided'}), 400
+        logger.info(f"Analyzing text of length: {len(news_text)}")
+        news_analyzer = get_analyzer()
         
         if len(news_text) > Config.MAX_TEXT_LENGTH:
-            return jsonify({
-                'error': f'Text too long. Please limit to {Config.MAX_TEXT_LENGTH} characters.'
-            }), 400
-        
-        logger.info(f"Analyzing text of length: {len(news_text)}")
+            return jsonify(build_check_response(news_analyzer, *news_analyzer.run_long_analysis(news_text)))
         
-        # Multi-model AI analysis
-        ai_results = {}
-        for model_key in ["primary", "secondary"]:
-            result = analyzer.call_huggingface_api(model_key, news_text)
-            if result:
-                ai_results[MODELS[model_key]["purpose"]] = result
-        
-        # Text pattern analysis
-        text_analysis = analyzer.analyze_text_patterns(news_text)
-        
-        # Process AI results
-        ai_processed = analyzer.process_ai_results(ai_results)
-        
-        # Calculate final credibility score
-        final_analysis = analyzer.calculate_credibility_score(text_analysis, ai_processed)
-        
-        # Prepare comprehensive response
-        response = {
-            'classification': 'CREDIBLE' if final_analysis['is_credible'] else 'SUSPICIOUS',
-            'confidence': final_analysis['confidence'],
-            'credibility_score': final_analysis['credibility_score'],
-            'isReal': final_analysis['is_credible'],
-            'explanation': '. '.join(final_analysis['risk_factors'][:3]) if final_analysis['risk_factors'] else 'Analysis shows standard content patterns',
-            'analysis_details': {
-                'risk_factors': final_analysis['risk_factors'],
-                'positive_factors': final_analysis['positive_factors'],
-                'text_stats': text_analysis['basic_stats'],
-                'ai_models_used': list(ai_results.keys()),
-                'timestamp': final_analysis['analysis_timestamp']
-            },
-            'ai_powered': True
-        }
+        # Multi-model AI analysis, with text pattern analysis running while models respond
+        ai_results, text_analysis, model_status = news_analyzer.run_analysis(news_text)
         
-        return jsonify(response)
+        return jsonify(build_check_response(news_analyzer, ai_results, text_analysis, model_status))
         
     except Exception as e:
         logger.error(f"Error in check_news: {str(e)}")
@@ -344,51 +3554,85 @@ def check_news():
             'error': 'An unexpected error occurred during analysis. Please try again.'
         }), 500
 
+@app.route('/check/stream', methods=['POST'])
+def check_news_stream():
+    """Streaming /check: the pattern-based score at once, then an update as each model answers
+
+    Long documents are analyzed window by window and get a single final event.
+    """
+    try:
+        news_text, error = parse_check_request(request.get_json(), Config.LONG_DOC_MAX_LENGTH)
+        if error:
+            return jsonify({'error': error}), 400
+    except Exception as e:
+        logger.error(f"Error in check_news_stream: {str(e)}")
+        return jsonify({'error': 'Invalid request'}), 400
+    
+    logger.info(f"Streaming analysis of text of length: {len(news_text)}")
+    news_analyzer = get_analyzer()
+    
+    def events():
+        try:
+            if len(news_text) > Config.MAX_TEXT_LENGTH:
+                ai_results, text_analysis, model_status, document = news_analyzer.run_long_analysis(news_text)
+                yield build_stream_event(news_analyzer, ai_results, text_analysis, model_status, [], document)
+                return
+            for snapshot in news_analyzer.iter_analysis(news_text):
+                yield build_stream_event(news_analyzer, *snapshot)
+        except Exception as e:
+            logger.error(f"Error in check_news_stream: {str(e)}")
+            yield format_sse('error', {'error': 'An unexpected error occurred during analysis. Please try again.'})
+    
+    return Response(events(), mimetype='text/event-stream', headers=STREAM_HEADERS)
+
 @app.route('/health')
 def health_check():
     """Enhanced health check with system status"""
-    return jsonify({
-        'status': 'healthy',
-        'service': 'TruthLens AI (Enhanced)',
-        'models_available': list(MODELS.keys()),
-        'api_token_configured': bool(Config.HF_API_TOKEN),
-        'timestamp': datetime.now().isoformat()
-    })
+    return jsonify(build_health_response(get_analyzer()))
+
+@app.route('/ready')
+def ready_check():
+    """Readiness probe: models have been warmed up"""
+    payload, status = build_ready_response(get_analyzer())
+    return jsonify(payload), status
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    """Queue texts for background analysis and return the job id at once"""
+    try:
+        get_analyzer()   # Starts the job queue on first use
+        payload, status = submit_job(job_runner, request.get_json())
+        return jsonify(payload), status
+    except Exception as e:
+        logger.error(f"Error in create_job: {str(e)}")
+        return jsonify({'error': 'Could not create job'}), 500
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """Progress and results of a background job"""
+    try:
+        get_analyzer()
+        payload, status = get_job_status(job_runner, job_id)
+        return jsonify(payload), status
+    except Exception as e:
+        logger.error(f"Error in job_status: {str(e)}")
+        return jsonify({'error': 'Could not read job'}), 500
+
+@app.route('/debug/latency')
+def latency_debug():
+    """Per-model latency histograms and derived timeouts"""
+    return jsonify(build_latency_debug_response(get_analyzer()))
 
 @app.route('/analyze/bulk', methods=['POST'])
 def bulk_analyze():
     """New endpoint for bulk analysis"""
     try:
         data = request.get_json()
-        texts = data.get('texts', [])
-        
-        if not texts or not isinstance(texts, list):
-            return jsonify({'error': 'No texts array provided'}), 400
-        
-        if len(texts) > 10:
-            return jsonify({'error': 'Maximum 10 texts allowed per request'}), 400
+        texts, error = parse_bulk_request(data)
+        if error:
+            return jsonify({'error': error}), 400
         
-        results = []
-        for idx, text in enumerate(texts):
-            if len(text.strip()) > 0:
-                # Simplified analysis for bulk processing
-                text_analysis = analyzer.analyze_text_patterns(text)
-                ai_processed = {"toxicity_score": 0, "sentiment_score": 0.5, "confidence_factors": []}
-                final_analysis = analyzer.calculate_credibility_score(text_analysis, ai_processed)
-                
-                results.append({
-                    'index': idx,
-                    'text_preview': text[:100] + '...' if len(text) > 100 else text,
-                    'classification': 'CREDIBLE' if final_analysis['is_credible'] else 'SUSPICIOUS',
-                    'credibility_score': final_analysis['credibility_score'],
-                    'confidence': final_analysis['confidence']
-                })
-        
-        return jsonify({
-            'results': results,
-            'total_analyzed': len(results),
-            'timestamp': datetime.now().isoformat()
-        })
+        return jsonify(build_bulk_response(get_analyzer(), texts, bool(data.get('use_models'))))
         
     except Exception as e:
         logger.error(f"Error in bulk_analyze: {str(e)}")
@@ -411,4 +3655,8 @@ if __name__ == '__main__':
     print("📦 Bulk analysis: /analyze/bulk")
     print("=" * 60)
     
+    # Warm the models up and start the job queue before the first request. With the
+    # reloader on, only its child process serves; the watching parent must not claim jobs.
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        get_analyzer()
     app.run(debug=True, host='127.0.0.1', port=5000)
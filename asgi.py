@@ -0,0 +1,198 @@
+"""ASGI entry point for TruthLens
+
+Serves the JSON API routes on a single event loop so one process can hold
+thousands of in-flight model calls:
+
+    pip install uvicorn httpx
+    uvicorn asgi:app --host 127.0.0.1 --port 8000
+"""
+import asyncio
+import json
+from typing import Dict, Optional, Tuple
+
+from app import (
+    AsyncNewsAnalyzer, Config, SAMPLE_TEXTS, STREAM_HEADERS, logger,
+    parse_check_request, build_check_response, build_stream_event, format_sse,
+    parse_bulk_request, build_bulk_response, build_health_response, build_ready_response,
+    build_latency_debug_response, submit_job, get_job_status, start_job_runner
+)
+
+analyzer = AsyncNewsAnalyzer()
+job_runner = None   # Started with the event loop, see lifespan
+
+
+async def read_json(receive) -> Optional[Dict]:
+    """Collect the request body and decode it as JSON"""
+    body = b""
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get("body", b"")
+        more_body = message.get("more_body", False)
+    try:
+        return json.loads(body) if body else None
+    except ValueError:
+        return None
+
+
+async def send_json(send, payload: Dict, status: int = 200):
+    """Write a complete JSON response"""
+    body = json.dumps(payload).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"access-control-allow-origin", b"*")
+        ]
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def check_news(receive) -> Tuple[Dict, int]:
+    """Async counterpart of the Flask /check route"""
+    try:
+        news_text, error = parse_check_request(await read_json(receive), Config.LONG_DOC_MAX_LENGTH)
+        if error:
+            return {'error': error}, 400
+
+        logger.info(f"Analyzing text of length: {len(news_text)}")
+        if len(news_text) > Config.MAX_TEXT_LENGTH:
+            return build_check_response(analyzer, *await analyzer.run_long_analysis(news_text)), 200
+        ai_results, text_analysis, model_status = await analyzer.run_analysis(news_text)
+        return build_check_response(analyzer, ai_results, text_analysis, model_status), 200
+
+    except Exception as e:
+        logger.error(f"Error in check_news: {str(e)}")
+        return {'error': 'An unexpected error occurred during analysis. Please try again.'}, 500
+
+
+async def check_news_stream(receive, send):
+    """Async counterpart of the Flask /check/stream route"""
+    try:
+        news_text, error = parse_check_request(await read_json(receive), Config.LONG_DOC_MAX_LENGTH)
+    except Exception as e:
+        logger.error(f"Error in check_news_stream: {str(e)}")
+        news_text, error = None, 'Invalid request'
+    if error:
+        await send_json(send, {'error': error}, 400)
+        return
+    
+    logger.info(f"Streaming analysis of text of length: {len(news_text)}")
+    headers = [(b"content-type", b"text/event-stream"), (b"access-control-allow-origin", b"*")]
+    headers += [(name.lower().encode(), value.encode()) for name, value in STREAM_HEADERS.items()]
+    await send({"type": "http.response.start", "status": 200, "headers": headers})
+    try:
+        if len(news_text) > Config.MAX_TEXT_LENGTH:
+            ai_results, text_analysis, model_status, document = await analyzer.run_long_analysis(news_text)
+            event = build_stream_event(analyzer, ai_results, text_analysis, model_status, [], document)
+            await send({"type": "http.response.body", "body": event.encode("utf-8"), "more_body": True})
+        else:
+            async for snapshot in analyzer.iter_analysis(news_text):
+                event = build_stream_event(analyzer, *snapshot)
+                await send({"type": "http.response.body", "body": event.encode("utf-8"), "more_body": True})
+    except Exception as e:
+        logger.error(f"Error in check_news_stream: {str(e)}")
+        event = format_sse('error', {'error': 'An unexpected error occurred during analysis. Please try again.'})
+        await send({"type": "http.response.body", "body": event.encode("utf-8"), "more_body": True})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def bulk_analyze(receive) -> Tuple[Dict, int]:
+    """Async counterpart of the Flask /analyze/bulk route"""
+    try:
+        texts, error = parse_bulk_request(await read_json(receive))
+        if error:
+            return {'error': error}, 400
+        return build_bulk_response(analyzer, texts), 200
+
+    except Exception as e:
+        logger.error(f"Error in bulk_analyze: {str(e)}")
+        return {'error': 'Bulk analysis failed'}, 500
+
+
+async def analyze_for_job(text: str) -> Dict:
+    """Async counterpart of app.analyze_for_job; model calls use the bulk rate limit lane"""
+    if len(text) > Config.MAX_TEXT_LENGTH:
+        return build_check_response(analyzer, *await analyzer.run_long_analysis(text, lane="bulk"))
+    ai_results, text_analysis, model_status = await analyzer.run_analysis(text, lane="bulk")
+    return build_check_response(analyzer, ai_results, text_analysis, model_status)
+
+
+async def create_job(receive) -> Tuple[Dict, int]:
+    """Async counterpart of the Flask POST /jobs route"""
+    try:
+        data = await read_json(receive)
+        # The queue is SQLite shared with other workers, so keep its writes off the event loop
+        return await asyncio.get_running_loop().run_in_executor(None, submit_job, job_runner, data)
+    except Exception as e:
+        logger.error(f"Error in create_job: {str(e)}")
+        return {'error': 'Could not create job'}, 500
+
+
+async def job_status(job_id: str) -> Tuple[Dict, int]:
+    """Async counterpart of the Flask GET /jobs/<id> route"""
+    try:
+        return await asyncio.get_running_loop().run_in_executor(None, get_job_status, job_runner, job_id)
+    except Exception as e:
+        logger.error(f"Error in job_status: {str(e)}")
+        return {'error': 'Could not read job'}, 500
+
+
+async def lifespan(receive, send):
+    """Warm the models up and start the job queue on startup; close the pooled client on shutdown"""
+    global job_runner
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            analyzer.start_warmup()
+            # Job threads run their analyses on this loop, with the serving analyzer
+            loop = asyncio.get_running_loop()
+            job_runner = start_job_runner(
+                lambda text: asyncio.run_coroutine_threadsafe(analyze_for_job(text), loop).result()
+            )
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await analyzer.aclose()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    """Route requests to the JSON API handlers"""
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    route = (scope["method"], scope["path"])
+    if route == ("POST", "/check/stream"):
+        await check_news_stream(receive, send)
+        return
+    if route == ("POST", "/check"):
+        payload, status = await check_news(receive)
+    elif route == ("POST", "/analyze/bulk"):
+        payload, status = await bulk_analyze(receive)
+    elif route == ("POST", "/jobs"):
+        payload, status = await create_job(receive)
+    elif scope["method"] == "GET" and scope["path"].startswith("/jobs/"):
+        payload, status = await job_status(scope["path"][len("/jobs/"):])
+    elif route == ("GET", "/health"):
+        # Reads the disk cache, job queue and rate limiter files, so keep it off the event loop
+        payload = await asyncio.get_running_loop().run_in_executor(None, build_health_response, analyzer)
+        status = 200
+    elif route == ("GET", "/debug/latency"):
+        payload, status = build_latency_debug_response(analyzer), 200
+    elif route == ("GET", "/ready"):
+        payload, status = build_ready_response(analyzer)
+    elif route == ("GET", "/samples"):
+        payload, status = SAMPLE_TEXTS, 200
+    elif scope["path"] in ("/check", "/check/stream", "/analyze/bulk", "/jobs", "/health", "/ready",
+                           "/debug/latency", "/samples") or scope["path"].startswith("/jobs/"):
+        payload, status = {'error': 'Method not allowed'}, 405
+    else:
+        payload, status = {'error': 'Not found'}, 404
+
+    await send_json(send, payload, status)
@@ -0,0 +1,262 @@
+"""Performance benchmarks for TruthLens
+
+    python benchmark.py backends --requests 200 --concurrency 8
+    python benchmark.py patterns --texts 200 --sizes 36 1000 10000 30000
+    python benchmark.py features --texts 2000
+    python benchmark.py batch --texts 50000
+
+Result caches are disabled so every call reaches a model.
+"""
+import argparse
+import os
+import random
+import re
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Benchmarks must not touch the shared on-disk cache and job queue, or probe the real models
+os.environ["DISK_CACHE_PATH"] = ""
+os.environ["HF_WARMUP"] = "0"
+os.environ["JOBS_DB_PATH"] = ""
+
+from app import (
+    Config, FAKE_NEWS_PATTERNS, FEATURE_COLUMNS, MODELS, SAMPLE_TEXTS, NewsAnalyzer, PhraseMatcher,
+    extract_feature_matrix, scan_text_features
+)
+
+
+def benchmark_texts(count: int):
+    """Distinct texts (so nothing is coalesced) built from the sample inputs"""
+    samples = list(SAMPLE_TEXTS.values())
+    return [f"{samples[i % len(samples)]} (sample {i})" for i in range(count)]
+
+
+def summarize(label: str, latencies, elapsed: float, failures: int):
+    latencies = sorted(latencies)
+    if not latencies:
+        print(f"{label:<28} no successful calls ({failures} failed)")
+        return
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    print(f"{label:<28} p50 {statistics.median(latencies) * 1000:8.1f} ms   "
+          f"p95 {p95 * 1000:8.1f} ms   "
+          f"{len(latencies) / elapsed:8.1f} calls/s   failures {failures}")
+
+
+def run_calls(news_analyzer: NewsAnalyzer, model_key: str, texts, concurrency: int):
+    """Call one model for every text and report latency and throughput"""
+    def timed_call(text):
+        started = time.perf_counter()
+        result = news_analyzer.call_huggingface_api(model_key, text, time.monotonic() + Config.ANALYSIS_DEADLINE)
+        return time.perf_counter() - started, result is not None
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(timed_call, texts))
+    elapsed = time.perf_counter() - started
+    latencies = [latency for latency, ok in outcomes if ok]
+    return latencies, elapsed, len(outcomes) - len(latencies)
+
+
+def bench_backends(args):
+    """Compare the hosted inference API with the local CPU backend"""
+    Config.RESULT_CACHE_MAX_BYTES = 0
+    texts = benchmark_texts(args.requests)
+
+    for backend in ("remote", "local"):
+        Config.INFERENCE_BACKEND = backend
+        try:
+            news_analyzer = NewsAnalyzer()
+        except RuntimeError as e:
+            print(f"{backend}: skipped ({e})")
+            continue
+        for model_key in ("primary", "secondary"):
+            if backend == "local" and not news_analyzer.local_backend.supports(model_key):
+                print(f"{backend}/{model_key}: no export in {Config.LOCAL_MODEL_DIR}, skipped")
+                continue
+            # Warm up so model loading and connection setup are not measured
+            news_analyzer.call_huggingface_api(model_key, texts[0])
+            for concurrency in (1, args.concurrency):
+                latencies, elapsed, failures = run_calls(news_analyzer, model_key, texts, concurrency)
+                summarize(f"{backend}/{model_key} x{concurrency}", latencies, elapsed, failures)
+
+
+def grown_lexicon(size: int, seed: int = 0):
+    """FAKE_NEWS_PATTERNS padded with made-up phrases to `size` entries in total
+
+    Padding phrases are built from random pseudo-words, so like a real lexicon
+    almost none of them occur in any given text.
+    """
+    rng = random.Random(seed)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    vocabulary = ["".join(rng.choice(letters) for _ in range(rng.randint(3, 9))) for _ in range(5000)]
+    lexicon = {category: list(phrases) for category, phrases in FAKE_NEWS_PATTERNS.items()}
+    categories = list(lexicon)
+    for i in range(max(0, size - sum(len(phrases) for phrases in lexicon.values()))):
+        phrase = " ".join(rng.choice(vocabulary) for _ in range(rng.randint(1, 3)))
+        lexicon[categories[i % len(categories)]].append(phrase)
+    return lexicon
+
+
+def bench_patterns(args):
+    """Per-phrase substring scans vs the compiled matcher as the lexicon grows"""
+    texts = [text.lower() for text in benchmark_texts(args.texts)]
+    for size in args.sizes:
+        lexicon = grown_lexicon(size)
+        started = time.perf_counter()
+        matcher = PhraseMatcher(lexicon)
+        built = time.perf_counter() - started
+
+        started = time.perf_counter()
+        naive = [{category: sum(1 for phrase in phrases if phrase in text) for category, phrases in lexicon.items()}
+                 for text in texts]
+        naive_elapsed = time.perf_counter() - started
+
+        started = time.perf_counter()
+        scanned = [{category: hits["count"] for category, hits in matcher.scan(text).items()} for text in texts]
+        matcher_elapsed = time.perf_counter() - started
+
+        mismatches = sum(1 for expected, actual in zip(naive, scanned) if expected != actual)
+        print(f"{len(matcher):>7} phrases   substring {naive_elapsed / len(texts) * 1e6:9.1f} us/text   "
+              f"matcher ({'automaton' if matcher.uses_automaton else 'find'}) "
+              f"{matcher_elapsed / len(texts) * 1e6:9.1f} us/text   "
+              f"build {built * 1000:7.1f} ms   mismatches {mismatches}")
+
+
+def reference_text_features(text: str):
+    """The original one-scan-per-feature extraction, kept as the parity reference for scan_text_features"""
+    words = text.split()
+    return {
+        "basic_stats": {
+            "length": len(text),
+            "word_count": len(words),
+            "sentence_count": len(re.findall(r'[.!?]+', text)),
+            "avg_word_length": sum(len(word) for word in words) / len(words) if words else 0
+        },
+        "punctuation_analysis": {
+            "exclamation_marks": text.count('!'),
+            "question_marks": text.count('?'),
+            "ellipses": text.count('...'),
+            "quotes": text.count('"') + text.count("'")
+        },
+        "formatting_flags": {
+            "all_caps_words": len([word for word in words if word.isupper() and len(word) > 2]),
+            "repeated_chars": len(re.findall(r'(.)\1{2,}', text)),
+            "excessive_punctuation": len(re.findall(r'[!?]{2,}', text))
+        },
+        "content_flags": {
+            "numbers": len(re.findall(r'\d+', text)),
+            "urls": len(re.findall(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', text)),
+            "mentions": len(re.findall(r'@\w+', text))
+        }
+    }
+
+
+def adversarial_texts(count: int, seed: int = 0):
+    """Random texts dense in the edge cases: punctuation runs, repeats, URLs, mentions, caps and Unicode"""
+    rng = random.Random(seed)
+    fragments = [
+        "word", "WORD", "Word", "BREAKING", "ab", "AB", "1", "2024", "\u0663\u0664", "\u00bd", ".", "..", "...", "....",
+        "!", "!!", "?!", "?.?", "!.!!", "aaa", "zzzz", "   ", "\t\t\t", "\n\n\n", "\u00a0", "\u2003", "\"", "'",
+        "@", "@user", "@@x", "@_", "@\u00e9t\u00e9", "http://", "https://x.com/a?b=1&c=%2F", "http://a@b", "hhhttp://z",
+        "\u01c5ABC", "\u00c9T\u00c9", "\u03a3\u03a3\u03a3", "x\u0301\u0301\u0301", "\ud83d\ude00", "#", "`", "~"
+    ]
+    texts = list(SAMPLE_TEXTS.values())
+    while len(texts) < count:
+        texts.append("".join(rng.choice(fragments) + rng.choice(["", "", " ", "\n"])
+                             for _ in range(rng.randint(0, 40))))
+    return texts
+
+
+def bench_features(args):
+    """Check scan_text_features against the per-feature scans, then time both"""
+    texts = adversarial_texts(args.texts)
+    mismatches = [text for text in texts if scan_text_features(text) != reference_text_features(text)]
+    print(f"parity: {len(texts) - len(mismatches)}/{len(texts)} texts identical")
+    for text in mismatches[:5]:
+        print(f"  mismatch on {text!r}")
+    if mismatches:
+        sys.exit(1)
+
+    for label, text in (("sample", " ".join(SAMPLE_TEXTS.values())), ("1500 chars", " ".join(texts)[:1500]),
+                        ("50000 chars", " ".join(texts)[:50000])):
+        timings = {}
+        for name, extract in (("per-feature", reference_text_features), ("scanner", scan_text_features)):
+            repeats = max(1, 200000 // max(1, len(text)))
+            started = time.perf_counter()
+            for _ in range(repeats):
+                extract(text)
+            timings[name] = (time.perf_counter() - started) / repeats
+        print(f"{label:<12} per-feature {timings['per-feature'] * 1e6:9.1f} us   "
+              f"scanner {timings['scanner'] * 1e6:9.1f} us   "
+              f"x{timings['per-feature'] / timings['scanner']:.2f}")
+
+
+def bench_batch(args):
+    """Per-text analysis and scoring vs the columnar batch extractor and vectorized scoring"""
+    news_analyzer = NewsAnalyzer()
+    heuristics_only = {"toxicity_score": 0, "sentiment_score": 0.5, "confidence_factors": []}
+    texts = adversarial_texts(args.texts)
+
+    started = time.perf_counter()
+    expected = []
+    for text in texts:
+        text_analysis = news_analyzer.analyze_text_patterns(text)
+        final_analysis = news_analyzer.calculate_credibility_score(text_analysis, heuristics_only)
+        flat = {column: value for section in ("basic_stats", "punctuation_analysis", "formatting_flags",
+                                              "content_flags", "fake_indicators")
+                for column, value in text_analysis[section].items()}
+        expected.append((flat, final_analysis))
+    per_text_elapsed = time.perf_counter() - started
+
+    started = time.perf_counter()
+    features = extract_feature_matrix(texts)
+    extracted = time.perf_counter() - started
+    scores = news_analyzer.calculate_credibility_scores(features)
+    batch_elapsed = time.perf_counter() - started
+
+    mismatches = 0
+    for index, (flat, final_analysis) in enumerate(expected):
+        row = {column: features[column][index].item() for column in FEATURE_COLUMNS}
+        scored = tuple(scores[key][index].item() for key in ("credibility_score", "is_credible", "confidence"))
+        if row != flat or scored != (final_analysis["credibility_score"], final_analysis["is_credible"],
+                                     final_analysis["confidence"]):
+            mismatches += 1
+    print(f"parity: {len(texts) - mismatches}/{len(texts)} texts identical")
+    if mismatches:
+        sys.exit(1)
+    print(f"per-text {len(texts) / per_text_elapsed:10.0f} texts/s   "
+          f"batch {len(texts) / batch_elapsed:10.0f} texts/s (extract {extracted:.2f} s, "
+          f"score {batch_elapsed - extracted:.3f} s)   x{per_text_elapsed / batch_elapsed:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    backends = subparsers.add_parser("backends", help="remote API vs local CPU inference")
+    backends.add_argument("--requests", type=int, default=100)
+    backends.add_argument("--concurrency", type=int, default=Config.MAX_WORKERS)
+    backends.set_defaults(func=bench_backends)
+
+    patterns = subparsers.add_parser("patterns", help="fake-news phrase matching as the lexicon grows")
+    patterns.add_argument("--texts", type=int, default=200)
+    patterns.add_argument("--sizes", type=int, nargs="+", default=[36, 1000, 10000, 30000])
+    patterns.set_defaults(func=bench_patterns)
+
+    features = subparsers.add_parser("features", help="text feature extraction parity and speed")
+    features.add_argument("--texts", type=int, default=2000)
+    features.set_defaults(func=bench_features)
+
+    batch = subparsers.add_parser("batch", help="columnar batch features and vectorized scoring")
+    batch.add_argument("--texts", type=int, default=50000)
+    batch.set_defaults(func=bench_batch)
+
+    args = parser.parse_args()
+    print(f"Models: {', '.join(MODELS[key]['name'] for key in ('primary', 'secondary'))}")
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
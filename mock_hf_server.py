@@ -0,0 +1,193 @@
+"""Mock Hugging Face inference server for offline load tests and benchmarks
+
+Speaks the hosted inference API shape for every model in MODELS, returning
+deterministic label/score payloads, with configurable latency, cold-start 503s,
+hung requests and errors:
+
+    python mock_hf_server.py --port 8081 --latency lognormal --latency-ms 120 \\
+        --loading-rate 0.02 --timeout-rate 0.01 --error-rate 0.01
+    HF_API_URL=http://127.0.0.1:8081/models/ python app.py
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Union
+
+# The mock only needs the model table, not the caches, job queue or warm-up probes
+os.environ.setdefault("DISK_CACHE_PATH", "")
+os.environ["HF_WARMUP"] = "0"
+os.environ["JOBS_DB_PATH"] = ""
+
+from app import MODELS
+
+# Labels each model family answers with
+PURPOSE_LABELS = {
+    "toxicity_detection": ["toxic", "non-toxic"],
+    "sentiment_analysis": ["negative", "neutral", "positive"]
+}
+
+
+class MockState:
+    """Fault settings, random source and request counters shared by all handler threads"""
+
+    def __init__(self, args):
+        self.args = args
+        self.random = random.Random(args.seed)
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+        self.models = {info["name"]: info for info in MODELS.values()}
+        self.counters = {"requests": 0, "ok": 0, "loading": 0, "timeouts": 0, "errors": 0, "inputs": 0}
+
+    def count(self, key: str, amount: int = 1):
+        with self.lock:
+            self.counters[key] += amount
+
+    def roll(self) -> float:
+        with self.lock:
+            return self.random.random()
+
+    def latency(self) -> float:
+        """Seconds to wait before answering, drawn from the configured distribution"""
+        mean = self.args.latency_ms / 1000
+        with self.lock:
+            if self.args.latency == "uniform":
+                spread = self.args.jitter_ms / 1000
+                return max(0.0, self.random.uniform(mean - spread, mean + spread))
+            if self.args.latency == "lognormal":
+                # latency_ms is the median; sigma controls the tail
+                return self.random.lognormvariate(0, self.args.sigma) * mean
+            return mean
+
+
+def classify(model_name: str, purpose: str, text: str) -> Union[List[Dict], Dict]:
+    """Deterministic answer for a text: the same input always gets the same scores"""
+    labels = PURPOSE_LABELS.get(purpose)
+    digest = hashlib.sha256(f"{model_name}\0{text}".encode("utf-8")).digest()
+    if labels is None:
+        # Generation models answer with generated text rather than label scores
+        return {"generated_text": f"{text} [{digest.hex()[:8]}]"}
+    weights = [byte + 1 for byte in digest[:len(labels)]]
+    total = sum(weights)
+    scores = sorted(
+        ({"label": label, "score": weight / total} for label, weight in zip(labels, weights)),
+        key=lambda item: item["score"], reverse=True
+    )
+    return scores
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    state: MockState = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        if self.state.args.verbose:
+            super().log_message(format, *args)
+
+    def send_json(self, status: int, payload, headers: Dict = None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        """Counters for checking what the load test actually exercised"""
+        with self.state.lock:
+            counters = dict(self.state.counters)
+        self.send_json(200, {"counters": counters, "models": list(self.state.models)})
+
+    def do_POST(self):
+        state, args = self.state, self.state.args
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self.send_json(400, {"error": "Invalid JSON"})
+            return
+
+        model_name = self.path.split("/models/", 1)[-1].strip("/")
+        model_info = state.models.get(model_name)
+        if model_info is None:
+            self.send_json(404, {"error": f"Model {model_name} does not exist"})
+            return
+
+        state.count("requests")
+        inputs = payload.get("inputs")
+        if not isinstance(inputs, (str, list)) or not inputs:
+            self.send_json(400, {"error": "inputs must be a string or a list of strings"})
+            return
+
+        # Cold start: every model reports loading until the warm-up period is over
+        cold_remaining = args.cold_start_s - (time.monotonic() - state.started)
+        if cold_remaining > 0 or state.roll() < args.loading_rate:
+            estimated = cold_remaining if cold_remaining > 0 else args.estimated_time
+            state.count("loading")
+            self.send_json(503, {"error": f"Model {model_name} is currently loading",
+                                 "estimated_time": round(estimated, 2)},
+                           {"Retry-After": str(max(1, round(estimated)))})
+            return
+
+        if state.roll() < args.timeout_rate:
+            # Hang past any sane client timeout, then answer anyway
+            state.count("timeouts")
+            time.sleep(args.hang_s)
+        else:
+            time.sleep(state.latency())
+
+        if state.roll() < args.error_rate:
+            state.count("errors")
+            self.send_json(500, {"error": "Internal inference error (injected)"})
+            return
+
+        texts = [inputs] if isinstance(inputs, str) else inputs
+        results = [classify(model_name, model_info["purpose"], text) for text in texts]
+        state.count("ok")
+        state.count("inputs", len(texts))
+        # A single input answers [[...]], a batch answers one entry per input
+        self.send_json(200, results[:1] if isinstance(inputs, str) else results)
+
+
+class MockServer(ThreadingHTTPServer):
+    # The default listen backlog of 5 resets connections under the concurrency load tests use
+    request_queue_size = 1024
+    daemon_threads = True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", choices=("fixed", "uniform", "lognormal"), default="fixed")
+    parser.add_argument("--latency-ms", type=float, default=50, help="fixed value, uniform mean or lognormal median")
+    parser.add_argument("--jitter-ms", type=float, default=25, help="half-width of the uniform distribution")
+    parser.add_argument("--sigma", type=float, default=0.5, help="lognormal shape; larger means a heavier tail")
+    parser.add_argument("--loading-rate", type=float, default=0.0, help="share of requests answered 503 loading")
+    parser.add_argument("--estimated-time", type=float, default=5.0, help="estimated_time reported with 503s")
+    parser.add_argument("--cold-start-s", type=float, default=0.0, help="answer 503 for this long after start")
+    parser.add_argument("--timeout-rate", type=float, default=0.0, help="share of requests that hang")
+    parser.add_argument("--hang-s", type=float, default=60.0, help="how long a hung request hangs")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered 500")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    MockHandler.state = MockState(args)
+    server = MockServer((args.host, args.port), MockHandler)
+    print(f"Mock inference API for {len(MockHandler.state.models)} models at "
+          f"http://{args.host}:{args.port}/models/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
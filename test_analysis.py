@@ -0,0 +1,774 @@
+import asyncio
+import copy
+import gc
+import json
+import os
+import threading
+import time
+import types
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# No disk cache, job queue or warm-up probes while testing
+os.environ["DISK_CACHE_PATH"] = ""
+os.environ["JOBS_DB_PATH"] = ""
+os.environ["HF_WARMUP"] = "0"
+
+import pytest
+import requests
+from urllib3.exceptions import ProtocolError
+
+import app
+from app import (DEFAULT_SCORING_RULES, FEATURE_COLUMNS, MODELS, SAMPLE_TEXTS, TEXT_ANALYSIS_SECTIONS, BatchDispatcher,
+                 CircuitBreaker, DiskResultCache, Document, InferenceTransport, JobRunner, JobStore, ModelResultCache,
+                 ModelUnavailable, NewsAnalyzer, PhraseMatcher, RetryScheduler, RuleTable, ScoringRules,
+                 SharedRateLimiter, SingleFlight, callback_url_error, extract_feature_matrix, scan_text_features)
+from benchmark import adversarial_texts, grown_lexicon, reference_text_features
+
+PLAIN_TEXT = "The city council met on Tuesday to discuss the budget for road repairs next year."
+QUOTED_TEXT = (
+    'The city council met on Tuesday to discuss the budget for road repairs next year. '
+    '"We expect the work to start in spring," the mayor said. ' * 6
+)
+TOXIC = [[{"label": "toxic", "score": 0.95}, {"label": "non-toxic", "score": 0.05}]]
+NEGATIVE = [[{"label": "negative", "score": 0.9}, {"label": "neutral", "score": 0.07},
+             {"label": "positive", "score": 0.03}]]
+
+
+@pytest.fixture(scope="module")
+def analyzer():
+    return NewsAnalyzer()
+
+
+def test_model_results_reach_the_score(analyzer):
+    text_analysis = analyzer.analyze_text_patterns(PLAIN_TEXT)
+    without_models = analyzer.calculate_credibility_score(text_analysis, analyzer.process_ai_results({}))
+    processed = analyzer.process_ai_results({"toxicity_detection": TOXIC, "sentiment_analysis": NEGATIVE})
+    with_models = analyzer.calculate_credibility_score(text_analysis, processed)
+
+    assert processed["toxicity_score"] == 0.95
+    assert processed["sentiment_label"] == "negative"
+    assert without_models["is_credible"]
+    assert not with_models["is_credible"]
+
+
+def test_confident_neutral_sentiment_does_not_change_the_verdict(analyzer):
+    text_analysis = analyzer.analyze_text_patterns(SAMPLE_TEXTS["real"])
+    baseline = analyzer.calculate_credibility_score(text_analysis, analyzer.process_ai_results({}))
+    neutral = [[{"label": "neutral", "score": 0.9}, {"label": "positive", "score": 0.06},
+                {"label": "negative", "score": 0.04}]]
+    non_toxic = [[{"label": "non-toxic", "score": 0.99}, {"label": "toxic", "score": 0.01}]]
+    processed = analyzer.process_ai_results({"toxicity_detection": non_toxic, "sentiment_analysis": neutral})
+    result = analyzer.calculate_credibility_score(text_analysis, processed)
+
+    assert processed["sentiment_label"] == "neutral"
+    assert processed["sentiment_score"] == 0
+    assert result["credibility_score"] == baseline["credibility_score"]
+    assert result["is_credible"] == baseline["is_credible"]
+    assert result["risk_factors"] == baseline["risk_factors"]
+
+
+def test_non_toxic_label_is_not_toxicity(analyzer):
+    result = [[{"label": "non-toxic", "score": 0.99}, {"label": "toxic", "score": 0.01}]]
+    assert analyzer.process_ai_results({"toxicity_detection": result})["toxicity_score"] == 0.01
+
+
+def test_cascade_calls_models_that_can_flip_the_verdict(analyzer):
+    model_status = {}
+    needed = analyzer._cascade(analyzer.analyze_text_patterns(PLAIN_TEXT), ("primary", "secondary"), model_status)
+    assert needed == ("primary", "secondary")
+    assert model_status == {}
+
+
+def test_cascade_skips_models_that_cannot_flip_the_verdict(analyzer):
+    # 63 points: the toxicity penalty (-20) flips the verdict, the sentiment penalty (-10) never does
+    model_status = {}
+    needed = analyzer._cascade(analyzer.analyze_text_patterns(QUOTED_TEXT), ("primary", "secondary"), model_status)
+    assert needed == ("primary",)
+    assert model_status == {"secondary": "skipped"}
+
+
+def test_route_only_uses_fallbacks_with_the_same_purpose(analyzer, monkeypatch):
+    monkeypatch.setitem(MODELS["primary"], "fallbacks", ["backup", "secondary"])
+    monkeypatch.setattr(analyzer, "_degraded", lambda model_key, deadline: "failing" if model_key == "primary" else None)
+    assert analyzer._route("primary", None) == "primary"
+
+    monkeypatch.setitem(MODELS["secondary"], "purpose", MODELS["primary"]["purpose"])
+    assert analyzer._route("primary", None) == "secondary"
+
+
+@pytest.mark.parametrize("size", [36, 500])
+def test_phrase_scans_agree(size, monkeypatch):
+    lexicon = grown_lexicon(size)
+    monkeypatch.setattr(app.Config, "PHRASE_AUTOMATON_MIN", size + 1)
+    by_find = PhraseMatcher(lexicon)
+    monkeypatch.setattr(app.Config, "PHRASE_AUTOMATON_MIN", 0)
+    by_automaton = PhraseMatcher(lexicon)
+    assert not by_find.uses_automaton and by_automaton.uses_automaton
+    for text in adversarial_texts(200) + ["you won't believe you won't believe what you won't believe"]:
+        lowered = text.lower()
+        assert by_find.scan(lowered) == by_automaton.scan(lowered)
+
+
+def test_scan_text_features_matches_reference():
+    mismatches = [text for text in adversarial_texts(2000) if scan_text_features(text) != reference_text_features(text)]
+    assert mismatches == []
+
+
+def test_document_features_match_reference():
+    for text in adversarial_texts(200, seed=1):
+        document = Document(text)
+        document.words   # The shared word split must not change the result
+        assert document.features == reference_text_features(text)
+
+
+def test_feature_matrix_matches_per_text_analysis(analyzer, monkeypatch):
+    pytest.importorskip("numpy")
+    # Several chunks, so the concatenation is covered too
+    monkeypatch.setattr(app.Config, "FEATURE_BATCH_CHUNK", 97)
+    texts = adversarial_texts(500, seed=2)
+    features = extract_feature_matrix(texts)
+    for index, text in enumerate(texts):
+        text_analysis = analyzer.analyze_text_patterns(text)
+        expected = {column: value for section in TEXT_ANALYSIS_SECTIONS
+                    for column, value in text_analysis[section].items()}
+        assert {column: features[column][index].item() for column in FEATURE_COLUMNS} == expected, text
+
+
+def test_batch_scores_match_per_text_scores(analyzer):
+    np = pytest.importorskip("numpy")
+    texts = adversarial_texts(500, seed=3)
+    toxicity = np.linspace(0, 1, len(texts))
+    sentiment = np.linspace(1, 0, len(texts))
+    scores = analyzer.calculate_credibility_scores(extract_feature_matrix(texts), toxicity, sentiment)
+    for index, text in enumerate(texts):
+        ai_processed = {"toxicity_score": toxicity[index].item(), "sentiment_score": sentiment[index].item()}
+        expected = analyzer.calculate_credibility_score(analyzer.analyze_text_patterns(text), ai_processed)
+        for key in ("credibility_score", "is_credible", "confidence"):
+            assert scores[key][index].item() == expected[key], (key, text)
+
+
+def reference_credibility_score(text_analysis, ai_processed):
+    """The original hard-coded scoring, kept as the parity reference for the default rule table"""
+    credibility_score = 50
+    risk_factors = []
+    positive_factors = []
+    fake_indicators = text_analysis["fake_indicators"]
+    basic_stats = text_analysis["basic_stats"]
+    punctuation = text_analysis["punctuation_analysis"]
+    formatting = text_analysis["formatting_flags"]
+    if fake_indicators["clickbait_count"] > 0:
+        credibility_score -= fake_indicators["clickbait_count"] * 15
+        risk_factors.append(f"Contains {fake_indicators['clickbait_count']} clickbait phrases")
+    if fake_indicators["sensational_words"] > 2:
+        credibility_score -= 10
+        risk_factors.append("Heavy use of sensational language")
+    if formatting["all_caps_words"] > 2:
+        credibility_score -= 8
+        risk_factors.append("Excessive capitalization")
+    if punctuation["exclamation_marks"] > 3:
+        credibility_score -= 5
+        risk_factors.append("Overuse of exclamation marks")
+    if basic_stats["word_count"] < 10:
+        credibility_score -= 10
+        risk_factors.append("Too brief for credible reporting")
+    elif basic_stats["word_count"] > 100:
+        credibility_score += 5
+        positive_factors.append("Substantial content length")
+    if punctuation["quotes"] > 0:
+        credibility_score += 8
+        positive_factors.append("Contains quoted sources")
+    if ai_processed["toxicity_score"] > 0.7:
+        credibility_score -= 20
+        risk_factors.append("AI detected toxic/misleading patterns")
+    if ai_processed["sentiment_score"] > 0.85:
+        credibility_score -= 10
+        risk_factors.append("Extreme emotional bias")
+    credibility_score = max(0, min(100, credibility_score))
+    return {
+        "credibility_score": credibility_score,
+        "is_credible": credibility_score >= 50,
+        "confidence": min(90, 60 + len(risk_factors + positive_factors) * 5),
+        "risk_factors": risk_factors,
+        "positive_factors": positive_factors
+    }
+
+
+def test_default_rules_match_reference_scoring(analyzer):
+    texts = list(SAMPLE_TEXTS.values()) + [QUOTED_TEXT, "You won't believe this SHOCKING truth!!!!"]
+    texts += adversarial_texts(300, seed=4)
+    for text in texts:
+        text_analysis = analyzer.analyze_text_patterns(text)
+        for toxicity, sentiment in ((0, 0), (0.7, 0.85), (0.71, 0.86), (1.0, 1.0)):
+            ai_processed = {"toxicity_score": toxicity, "sentiment_score": sentiment}
+            result = analyzer.calculate_credibility_score(text_analysis, ai_processed)
+            del result["analysis_timestamp"]
+            assert result == reference_credibility_score(text_analysis, ai_processed), text
+
+
+def with_changes(**changes):
+    table = copy.deepcopy(DEFAULT_SCORING_RULES)
+    rule = changes.pop("rule", None)
+    if rule:
+        table["rules"][0].update(rule)
+    table.update(changes)
+    return table
+
+
+@pytest.mark.parametrize("table", [
+    with_changes(base_score="50"),
+    with_changes(credible_threshold=None),
+    with_changes(confidence={"base": 60, "per_factor": "5", "max": 90}),
+    with_changes(rule={"op": [">"]}),
+    with_changes(rule={"kind": ["risk"]}),
+    with_changes(rule={"message": "{value[0]}"}),
+    with_changes(rule={"message": "{value:d}"}),
+    with_changes(rule={"threshold": "0"}),
+])
+def test_invalid_rule_tables_are_rejected(table):
+    with pytest.raises(ValueError):
+        RuleTable(table)
+
+
+def test_bad_rule_file_keeps_the_current_table(tmp_path):
+    path = tmp_path / "rules.json"
+    table = with_changes(base_score=60)
+    path.write_text(json.dumps(table))
+    rules = ScoringRules(str(path), 0)
+    assert rules.current().base_score == 60
+
+    table["rules"][0]["op"] = [">"]
+    path.write_text(json.dumps(table))
+    assert rules.current().base_score == 60
+    assert rules.errors == 1
+
+
+def test_cascade_follows_the_rule_table_bands(analyzer, monkeypatch):
+    # Mid-range toxicity costs 30 points, high toxicity gives them back: only 0.3 < toxicity <= 0.8 flips
+    table = with_changes(rules=[
+        {"feature": "toxicity_score", "op": ">", "threshold": 0.3, "delta": -30, "kind": "risk",
+         "message": "Somewhat toxic"},
+        {"feature": "toxicity_score", "op": ">", "threshold": 0.8, "delta": 30, "kind": "positive",
+         "message": "Satire"},
+        {"feature": "sentiment_score", "op": "==", "threshold": 0.5, "delta": -10, "kind": "risk",
+         "message": "Exactly neutral"}
+    ])
+    monkeypatch.setattr(analyzer, "scoring_rules", types.SimpleNamespace(current=lambda: RuleTable(table)))
+    needed = analyzer._cascade(analyzer.analyze_text_patterns(PLAIN_TEXT), ("primary", "secondary"), {})
+    assert needed == ("primary", "secondary")
+
+
+def test_cascade_skips_nothing_with_a_signal_scored_per_unit(analyzer, monkeypatch):
+    table = with_changes(base_score=100, rules=[
+        {"feature": "toxicity_score", "op": ">", "threshold": 0, "delta_per_unit": -60, "kind": "risk",
+         "message": "Toxicity {value}"}
+    ])
+    monkeypatch.setattr(analyzer, "scoring_rules", types.SimpleNamespace(current=lambda: RuleTable(table)))
+    needed = analyzer._cascade(analyzer.analyze_text_patterns(PLAIN_TEXT), ("primary", "secondary"), {})
+    assert needed == ("primary", "secondary")
+
+
+class FakeResponse:
+    def __init__(self, payload, status_code=200):
+        self.payload = payload
+        self.status_code = status_code
+        self.headers = {}
+        self.text = json.dumps(payload)
+
+    def json(self):
+        return self.payload
+
+
+def half_open(breaker):
+    """Put a breaker at the end of its cooldown, so the next allow() admits the probe"""
+    breaker.state = CircuitBreaker.OPEN
+    breaker.opened_at = time.monotonic() - app.Config.BREAKER_COOLDOWN - 1
+    return breaker
+
+
+@pytest.mark.parametrize("batched", [False, True])
+def test_async_half_open_probe_closes_the_breaker(batched, monkeypatch):
+    pytest.importorskip("httpx")
+    analyzer = app.AsyncNewsAnalyzer()
+    monkeypatch.setattr(analyzer.transport, "post", lambda url, payload, timeout: FakeResponse(TOXIC))
+
+    async def post_hedged(model_key, url, payload, timeout, lane="interactive"):
+        return FakeResponse(TOXIC)
+
+    monkeypatch.setattr(analyzer, "_post_hedged", post_hedged)
+    if batched:
+        analyzer.batchers = {"primary": BatchDispatcher(
+            "primary", lambda texts, deadline, lane: analyzer._start_batch_request("primary", texts, deadline, lane),
+            0.005, 16
+        )}
+    breaker = half_open(analyzer.breakers["primary"])
+
+    result = asyncio.run(analyzer._fetch_model_result("primary", "probe text", "probe-hash", time.monotonic() + 5))
+    assert result == TOXIC
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.rejected == 0
+
+
+class FakeClock:
+    """Stands in for time.time / time.monotonic; advanced by hand"""
+
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def job_store(tmp_path, monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(app.time, "time", clock)
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    store.clock = clock
+    return store
+
+
+@pytest.mark.parametrize("url", [
+    "http://127.0.0.1/hook", "http://localhost:8080/hook", "http://10.1.2.3/hook", "http://169.254.169.254/latest",
+    "http://[::1]/hook", "http://0.0.0.0/hook", "http://224.0.0.1/hook", "ftp://93.184.216.34/hook",
+    "http://93.184.216.34:99999/hook", "http:///hook", "javascript:alert(1)"
+])
+def test_callback_urls_to_internal_hosts_are_rejected(url):
+    assert callback_url_error(url) is not None
+
+
+def test_callback_url_checks(monkeypatch):
+    assert callback_url_error("https://93.184.216.34/hook") is None
+    monkeypatch.setattr(app.Config, "JOB_CALLBACK_HOSTS", frozenset({"hooks.example.com"}))
+    assert callback_url_error("https://hooks.example.com/hook") is None
+    assert callback_url_error("https://93.184.216.34/hook") is not None
+    assert app.parse_job_request({"texts": ["a"], "callback_url": "http://127.0.0.1/"})[0] is None
+
+
+def test_job_lease_expiry_hands_the_job_to_another_worker(job_store):
+    job_id = job_store.create(["first", "second"], None)
+    job = job_store.claim()
+    assert job["id"] == job_id and job_store.claim() is None
+    job_store.save_progress(job_id, [{"text": "first"}])
+
+    job_store.clock.now += app.Config.JOB_LEASE + 1
+    resumed = job_store.claim()
+    assert resumed["id"] == job_id
+    assert resumed["results"] == [{"text": "first"}]
+    assert job_store.get(job_id)["attempts"] == 2
+
+
+def test_abandoned_job_fails_and_queues_its_callback(job_store):
+    job_id = job_store.create(["text"], "https://hooks.example.com/hook")
+    for _ in range(app.Config.JOB_MAX_ATTEMPTS):
+        assert job_store.claim()["id"] == job_id
+        job_store.clock.now += app.Config.JOB_LEASE + 1
+    assert job_store.claim() is None
+
+    job = job_store.get(job_id)
+    assert job["status"] == "failed"
+    assert job["callback_status"] == "pending"
+    assert job_store.claim_callback()["id"] == job_id
+
+
+def test_callback_is_retried_with_backoff_then_failed(job_store, monkeypatch):
+    monkeypatch.setattr(app.Config, "JOB_CALLBACK_HOSTS", frozenset({"hooks.example.com"}))
+    posts = []
+
+    def post(url, **kwargs):
+        posts.append(kwargs)
+        return FakeResponse({}, status_code=500)
+
+    monkeypatch.setattr(app.requests, "post", post)
+    monkeypatch.setattr(app.time, "sleep", lambda seconds: pytest.fail("callback delivery slept"))
+    runner = JobRunner(job_store, lambda text: {"text": text}, 0)
+    job_id = job_store.create(["text"], "https://hooks.example.com/hook")
+    runner._process(job_store.claim())
+    assert job_store.get(job_id)["status"] == "done"
+
+    for attempt in range(1, app.Config.JOB_CALLBACK_RETRIES + 1):
+        callback = job_store.claim_callback()
+        assert callback["attempt"] == attempt
+        assert job_store.claim_callback() is None   # Leased while it is being delivered
+        runner._notify(callback)
+        job_store.clock.now += 2 ** attempt
+    assert job_store.get(job_id)["callback_status"] == "failed"
+    assert job_store.claim_callback() is None
+    assert len(posts) == app.Config.JOB_CALLBACK_RETRIES
+    assert all(kwargs["allow_redirects"] is False for kwargs in posts)
+
+
+def test_callback_delivered_once(job_store, monkeypatch):
+    monkeypatch.setattr(app.Config, "JOB_CALLBACK_HOSTS", frozenset({"hooks.example.com"}))
+    monkeypatch.setattr(app.requests, "post", lambda url, **kwargs: FakeResponse({}))
+    runner = JobRunner(job_store, lambda text: {"text": text}, 0)
+    job_id = job_store.create(["text"], "https://hooks.example.com/hook")
+    runner._process(job_store.claim())
+    runner._notify(job_store.claim_callback())
+    assert job_store.get(job_id)["callback_status"] == "delivered"
+    assert job_store.claim_callback() is None
+
+
+def test_result_cache_expires_entries(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(app.time, "monotonic", clock)
+    cache = ModelResultCache(max_bytes=10_000, ttl=60)
+    cache.put(("primary", "a"), TOXIC)
+    clock.now += 59
+    assert cache.get(("primary", "a")) == TOXIC
+    clock.now += 1
+    assert cache.get(("primary", "a")) is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["expirations"], stats["bytes"]) == (1, 1, 1, 0)
+
+
+def test_result_cache_evicts_least_recently_used():
+    size = len(json.dumps(TOXIC))
+    cache = ModelResultCache(max_bytes=3 * size, ttl=60)
+    for key in "abc":
+        cache.put(("primary", key), TOXIC)
+    cache.get(("primary", "a"))     # Now b is the least recently used
+    cache.put(("primary", "d"), TOXIC)
+    assert cache.get(("primary", "b")) is None
+    assert all(cache.get(("primary", key)) == TOXIC for key in "acd")
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["bytes"] == 3 * size
+
+
+def test_disk_cache_round_trip_and_ttl(tmp_path, monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(app.time, "time", clock)
+    cache = DiskResultCache(str(tmp_path / "cache.sqlite3"), max_bytes=1 << 20, ttl=3600)
+    cache.put("primary", "hash", TOXIC)
+    assert cache.get("primary", "hash") == TOXIC
+    assert cache.get("secondary", "hash") is None
+    clock.now += 3600
+    assert cache.get("primary", "hash") is None
+
+
+def test_disk_cache_misses_stale_model_versions(tmp_path, monkeypatch):
+    cache = DiskResultCache(str(tmp_path / "cache.sqlite3"), max_bytes=1 << 20, ttl=3600)
+    cache.put("primary", "hash", TOXIC)
+    monkeypatch.setitem(MODELS["primary"], "revision", "v2")
+    assert cache.get("primary", "hash") is None
+
+
+def test_disk_cache_counts_every_lookup_across_threads(tmp_path):
+    cache = DiskResultCache(str(tmp_path / "cache.sqlite3"), max_bytes=1 << 20, ttl=3600)
+    cache.put("primary", "hit", TOXIC)
+
+    def lookups():
+        for index in range(100):
+            cache.get("primary", "hit" if index % 2 else "miss")
+
+    threads = [threading.Thread(target=lookups) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["errors"]) == (400, 400, 0)
+
+
+class FakeBatchSender:
+    """send_batch for a BatchDispatcher: records batches and answers each from a script"""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.batches = []
+
+    def __call__(self, texts, deadline, lane):
+        self.batches.append((list(texts), lane))
+        outcome = self.outcomes.pop(0) if self.outcomes else "echo"
+        if isinstance(outcome, BaseException) and not isinstance(outcome, ModelUnavailable):
+            raise outcome
+        future = Future()
+        if isinstance(outcome, ModelUnavailable):
+            future.set_exception(outcome)
+        else:
+            future.set_result([text.upper() for text in texts] if outcome == "echo" else outcome)
+        return future
+
+
+def submit_all(dispatcher, texts, lane="interactive"):
+    return [dispatcher.submit(text, time.monotonic() + 5, lane) for text in texts]
+
+
+def test_batch_fans_results_out_to_each_caller():
+    sender = FakeBatchSender()
+    dispatcher = BatchDispatcher("primary", sender, window=0.05, max_size=3)
+    futures = submit_all(dispatcher, "abcde", lane="bulk")
+    assert [future.result(timeout=2) for future in futures] == list("ABCDE")
+    assert [texts for texts, _ in sender.batches] == [list("abc"), list("de")]
+    assert dispatcher.stats()["batches_sent"] == 2
+    assert {lane for _, lane in sender.batches} == {"bulk"}
+
+
+def test_batch_failure_reaches_every_caller():
+    sender = FakeBatchSender(ModelUnavailable("primary", "error", "HTTP 500"), ["only one"])
+    dispatcher = BatchDispatcher("primary", sender, window=0.05, max_size=8)
+    for future in submit_all(dispatcher, "ab"):
+        assert isinstance(future.exception(timeout=2), ModelUnavailable)
+    # A response that is not one result per input fails the batch instead of leaving callers waiting
+    for future in submit_all(dispatcher, "cd"):
+        assert isinstance(future.exception(timeout=2), ModelUnavailable)
+
+
+def test_batch_send_that_raises_keeps_the_dispatcher_running():
+    sender = FakeBatchSender(RuntimeError("cannot schedule new futures after shutdown"))
+    dispatcher = BatchDispatcher("primary", sender, window=0.05, max_size=8)
+    for future in submit_all(dispatcher, "ab"):
+        assert isinstance(future.exception(timeout=2), RuntimeError)
+    assert [future.result(timeout=2) for future in submit_all(dispatcher, "cd")] == ["C", "D"]
+
+
+def test_single_flight_shares_one_call():
+    flight = SingleFlight()
+    shared = Future()
+    starts = []
+
+    def start():
+        starts.append(1)
+        return shared
+
+    first = flight.do(("primary", "hash"), start)
+    second = flight.do(("primary", "hash"), start)
+    assert second.cancel()   # A follower giving up leaves the shared call running
+    assert not shared.cancelled()
+    shared.set_result(TOXIC)
+    assert first.result(timeout=1) == TOXIC
+    assert len(starts) == 1
+    assert flight.stats() == {"in_flight": 0, "leaders": 1, "coalesced": 1}
+
+    failed = Future()
+    follower = flight.do(("primary", "hash"), lambda: failed)
+    failed.set_exception(ModelUnavailable("primary", "error"))
+    assert isinstance(follower.exception(timeout=1), ModelUnavailable)
+    assert flight.stats()["leaders"] == 2
+
+
+def test_abandoned_coalesced_call_failure_is_retrieved():
+    pytest.importorskip("httpx")
+    analyzer = app.AsyncNewsAnalyzer()
+    calls = []
+
+    async def fetch(model_key, text, text_hash, deadline, lane="interactive"):
+        calls.append(text_hash)
+        await asyncio.sleep(0.05)
+        raise ModelUnavailable(model_key, "error", "late failure")
+
+    analyzer._fetch_model_result = fetch
+    unretrieved = []
+
+    async def main():
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: unretrieved.append(context))
+        waiters = [analyzer._coalesced_fetch("primary", "text", "hash", None) for _ in range(2)]
+        for waiter in waiters:
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(waiter, 0.01)
+        await asyncio.sleep(0.1)   # The shared call fails after every waiter gave up
+        gc.collect()
+
+    asyncio.run(main())
+    assert calls == ["hash"]
+    assert unretrieved == []
+
+
+@pytest.fixture
+def breaker(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(app.time, "monotonic", clock)
+    breaker = CircuitBreaker("primary")
+    breaker.clock = clock
+    return breaker
+
+
+def trip(breaker):
+    for _ in range(app.Config.BREAKER_MIN_CALLS):
+        assert breaker.allow()
+        breaker.record(False, 0.1)
+
+
+def test_breaker_needs_min_calls_at_error_rate(breaker):
+    for _ in range(app.Config.BREAKER_MIN_CALLS - 1):
+        breaker.record(False, 0.1)
+    assert breaker.state == CircuitBreaker.CLOSED   # Too few outcomes to judge
+    breaker.record(False, 0.1)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.trips == 1
+
+
+def test_breaker_ignores_failures_below_error_rate(breaker):
+    for ok in [True, True, False, True, False, True]:
+        breaker.record(ok, 0.1)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_breaker_counts_slow_calls_as_failures(breaker):
+    for _ in range(app.Config.BREAKER_MIN_CALLS):
+        breaker.record(True, app.Config.BREAKER_SLOW_CALL + 1)
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_breaker_forgets_outcomes_outside_window(breaker):
+    for _ in range(app.Config.BREAKER_MIN_CALLS - 1):
+        breaker.record(False, 0.1)
+    breaker.clock.now += app.Config.BREAKER_WINDOW + 1
+    breaker.record(False, 0.1)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_open_breaker_rejects_until_cooldown_then_probes_once(breaker):
+    trip(breaker)
+    assert not breaker.allow()
+    assert breaker.rejected == 1
+    breaker.clock.now += app.Config.BREAKER_COOLDOWN
+    assert breaker.allow()   # The probe
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()
+    assert breaker.rejected == 2
+    breaker.record(True, 0.1)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+
+
+def test_failed_probe_reopens_breaker(breaker):
+    trip(breaker)
+    breaker.clock.now += app.Config.BREAKER_COOLDOWN
+    assert breaker.allow()
+    breaker.record(False, 0.1)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.trips == 2
+    assert not breaker.allow()
+
+
+def test_lost_probe_frees_half_open_slot(breaker):
+    trip(breaker)
+    breaker.clock.now += app.Config.BREAKER_COOLDOWN
+    assert breaker.allow()
+    breaker.clock.now += app.Config.REQUEST_TIMEOUT + 1   # The probe never reported back
+    assert breaker.allow()
+
+
+class FakeSession:
+    """requests.Session whose posts take a step of the fake clock and return or raise the queued outcomes"""
+
+    def __init__(self, clock, *outcomes):
+        self.clock = clock
+        self.outcomes = list(outcomes)
+        self.headers = {}
+        self.timeouts = []
+
+    def mount(self, prefix, adapter):
+        pass
+
+    def post(self, url, json=None, timeout=None):
+        self.timeouts.append(timeout)
+        self.clock.now += 2
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+@pytest.fixture
+def transport_clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(app.time, "monotonic", clock)
+    monkeypatch.setattr(app.Config, "HTTP2_ENABLED", False)
+    return clock
+
+
+def test_stale_connection_is_resent_within_timeout(transport_clock):
+    reset = requests.exceptions.ConnectionError(ProtocolError("Connection aborted.", ConnectionResetError()))
+    session = FakeSession(transport_clock, reset, FakeResponse([TOXIC]))
+    transport = InferenceTransport(session)
+    assert transport.post("http://inference/primary", {"inputs": "text"}, timeout=10).json() == [TOXIC]
+    assert session.timeouts == [10, 8]
+    assert transport.stats()["stale_retries"] == 1
+    assert transport.stats()["in_flight"] == 0
+
+
+@pytest.mark.parametrize("error", [
+    requests.exceptions.ConnectTimeout("connect timed out"),
+    requests.exceptions.ConnectionError("connection refused"),
+], ids=["connect-timeout", "refused"])
+def test_connect_failures_are_not_resent(transport_clock, error):
+    session = FakeSession(transport_clock, error, FakeResponse([TOXIC]))
+    transport = InferenceTransport(session)
+    with pytest.raises(type(error)):
+        transport.post("http://inference/primary", {"inputs": "text"}, timeout=10)
+    assert session.timeouts == [10]
+    assert transport.stats()["stale_retries"] == 0
+
+
+def test_stale_connection_past_timeout_is_not_resent(transport_clock):
+    reset = requests.exceptions.ConnectionError(ProtocolError("Connection aborted.", ConnectionResetError()))
+    session = FakeSession(transport_clock, reset, FakeResponse([TOXIC]))
+    transport = InferenceTransport(session)
+    with pytest.raises(requests.exceptions.ConnectionError):
+        transport.post("http://inference/primary", {"inputs": "text"}, timeout=2)
+    assert session.timeouts == [2]
+
+
+@pytest.fixture
+def rate_limiter(tmp_path, monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(app.time, "time", clock)
+    monkeypatch.setattr(app.Config, "RATE_LIMIT_BULK_RESERVE", 0.5)
+    limiter = SharedRateLimiter(str(tmp_path), per_minute=60, burst=10)
+    limiter.clock = clock
+    return limiter
+
+
+def test_bulk_lane_leaves_reserve_for_interactive(rate_limiter):
+    assert [rate_limiter.try_acquire("primary", "bulk") for _ in range(5)] == [0.0] * 5
+    assert rate_limiter.try_acquire("primary", "bulk") == pytest.approx(1.0)   # Half the burst is held back
+    assert [rate_limiter.try_acquire("primary") for _ in range(5)] == [0.0] * 5
+    assert rate_limiter.try_acquire("primary") == pytest.approx(1.0)
+    assert rate_limiter.time_until_available("primary", "bulk") == pytest.approx(6.0)
+    assert rate_limiter.try_acquire("secondary", "bulk") == 0.0   # Buckets are per model
+    stats = rate_limiter.stats()
+    assert stats["granted"] == {"interactive": 5, "bulk": 6}
+    assert stats["throttled"] == {"interactive": 1, "bulk": 1}
+
+
+def test_rate_limiter_refills_over_time(rate_limiter):
+    for _ in range(10):
+        assert rate_limiter.try_acquire("primary") == 0.0
+    assert rate_limiter.try_acquire("primary") > 0
+    rate_limiter.clock.now += 3
+    assert [rate_limiter.try_acquire("primary") for _ in range(3)] == [0.0] * 3
+    assert rate_limiter.try_acquire("primary") > 0
+    rate_limiter.clock.now += 3600   # Refill stops at the burst
+    assert rate_limiter.time_until_available("primary", "bulk") == 0.0
+    assert [rate_limiter.try_acquire("primary") for _ in range(11)].count(0.0) == 10
+
+
+def test_rate_limiter_budget_is_shared_through_state_files(rate_limiter):
+    sibling = SharedRateLimiter(rate_limiter.directory, per_minute=60, burst=10)
+    for _ in range(5):
+        assert rate_limiter.try_acquire("primary", "bulk") == 0.0
+    assert sibling.try_acquire("primary", "bulk") > 0
+    assert sibling.try_acquire("primary") == 0.0
+
+
+def test_retry_scheduler_runs_parked_calls_when_due():
+    executor = ThreadPoolExecutor(max_workers=1)
+    scheduler = RetryScheduler(executor)
+    ran = []
+    done = threading.Event()
+    started = time.monotonic()
+
+    def retry(label):
+        ran.append((label, time.monotonic() - started))
+        if label == "late":
+            done.set()
+
+    scheduler.call_later(0.2, retry, "late")
+    scheduler.call_later(0.05, retry, "early")
+    assert scheduler.stats()["scheduled"] == 2
+    assert done.wait(2)
+    executor.shutdown(wait=True)
+    assert [label for label, _ in ran] == ["early", "late"]
+    assert ran[0][1] >= 0.05 and ran[1][1] >= 0.2
+    assert scheduler.stats() == {"parked": 0, "scheduled": 2}